@@ -0,0 +1,274 @@
+# bench.py
+# Benchmarks sem janela (SDL_VIDEODRIVER=dummy) dos caminhos quentes do
+# backend e do desenho. Cenários com semente fixa, de 10 a 10.000 peças.
+#
+#   python bench.py                          # roda e grava bench_report.json
+#   python bench.py --baseline antigo.json   # compara e marca regressões
+#   python bench.py --sizes 10 100 --repeat 5
+#
+# Sai com código 1 quando há regressão e --fail-on-regression foi pedido.
+
+import os
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import argparse
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+
+import backend
+
+SIZES = (10, 100, 1000, 10000)
+REPEAT = 20
+SEED = 1234
+REGRESSION_THRESHOLD = 0.25   # mediana 25% mais lenta que a base = regressão
+
+PIECE_KINDS = (("x", 1), ("x", -1), ("n", 1), ("n", -1))
+
+
+# -----------------------------
+# Cenários
+# -----------------------------
+def build_scenario(n, seed=SEED, divisoes=0):
+    """
+    Sessão nova (e atual no backend) com n peças aleatórias espalhadas pelos
+    dois lados, já empacotadas. Mesma semente, mesmo tabuleiro.
+    """
+    session = backend.new_session(seed)
+    rng = random.Random(seed * 7919 + n)
+    if divisoes:
+        session.set_divisoes(divisoes)
+    subs = max(1, divisoes)
+    for _ in range(n):
+        ptype, sign = rng.choice(PIECE_KINDS)
+        side = "left" if rng.random() < 0.5 else "right"
+        session.add_piece(ptype, sign, side, sub=rng.randrange(subs))
+    session.pack_pieces(full=True)
+    return session
+
+
+def _timed(fn, repeat, setup=None):
+    """Tempos (s) de fn(); setup() roda fora da medição e devolve o argumento."""
+    times = []
+    for _ in range(repeat):
+        arg = setup() if setup is not None else None
+        t0 = time.perf_counter()
+        fn(arg)
+        times.append(time.perf_counter() - t0)
+    return times
+
+
+def _summary(name, n, times):
+    us = [t * 1e6 for t in times]
+    return {
+        "bench": name,
+        "n": n,
+        "repeat": len(us),
+        "min_us": round(min(us), 2),
+        "median_us": round(statistics.median(us), 2),
+        "mean_us": round(statistics.fmean(us), 2),
+    }
+
+
+# -----------------------------
+# Benchmarks do backend
+# -----------------------------
+def bench_pack_pieces(n, repeat):
+    """Soltar uma peça: move de lado e reempacota (caminho incremental)."""
+    session = build_scenario(n)
+    rng = random.Random(n)
+
+    def setup(_=None):
+        piece = rng.choice(list(session.pieces))
+        session.move_piece(piece, "right" if piece.side == "left" else "left")
+
+    def run(_):
+        session.pack_pieces()
+
+    return _timed(run, repeat, setup)
+
+
+def bench_pack_pieces_full(n, repeat):
+    session = build_scenario(n)
+    return _timed(lambda _: session.pack_pieces(full=True), repeat)
+
+
+def bench_find_and_annihilate_pairs(n, repeat):
+    # anular é destrutivo: cada repetição parte de um tabuleiro novo
+    return _timed(lambda s: s.find_and_annihilate_pairs(), repeat,
+                  setup=lambda: build_scenario(n))
+
+
+def bench_compute_equation_from_pieces(n, repeat):
+    session = build_scenario(n)
+    return _timed(lambda _: session.compute_equation_from_pieces(), repeat)
+
+
+def bench_generate_random_equation_and_pieces(n, repeat):
+    # parte de um tabuleiro com n peças: inclui limpar o que havia
+    def run(s):
+        s.generate_random_equation_and_pieces()
+        s.pack_pieces()
+    return _timed(run, repeat, setup=lambda: build_scenario(n))
+
+
+BACKEND_BENCHES = (
+    ("pack_pieces", bench_pack_pieces),
+    ("pack_pieces_full", bench_pack_pieces_full),
+    ("find_and_annihilate_pairs", bench_find_and_annihilate_pairs),
+    ("compute_equation_from_pieces", bench_compute_equation_from_pieces),
+    ("generate_random_equation_and_pieces", bench_generate_random_equation_and_pieces),
+)
+
+
+# -----------------------------
+# Benchmarks do desenho (pygame, sem janela)
+# -----------------------------
+def bench_draw_ui(frontend, n, repeat):
+    build_scenario(n)
+    frontend.draw_ui()   # aquece caches de sprites e fundo
+    return _timed(lambda _: frontend.draw_ui(), repeat)
+
+
+def bench_mainloop_frame(frontend, n, repeat):
+    """Um frame do mainloop arrastando uma peça (eventos + animações + desenho)."""
+    import pygame
+    session = build_scenario(n)
+    piece = next(iter(session.pieces))
+    piece.dragging = True
+    piece.offset = (0, 0)
+    frontend.dragging_piece = piece
+    frontend.invalidate_screen()
+    frontend.run_frame([], 1.0 / frontend.FPS)
+    step = [0]
+
+    def setup():
+        step[0] += 1
+        pos = (300 + (step[0] % 2) * 40, 300)
+        return [pygame.event.Event(pygame.MOUSEMOTION, pos=pos, rel=(0, 0), buttons=(1, 0, 0))]
+
+    try:
+        return _timed(lambda events: frontend.run_frame(events, 1.0 / frontend.FPS), repeat, setup)
+    finally:
+        piece.dragging = False
+        frontend.dragging_piece = None
+
+
+RENDER_BENCHES = (
+    ("draw_ui", bench_draw_ui),
+    ("mainloop_frame", bench_mainloop_frame),
+)
+
+
+# -----------------------------
+# Relatório e comparação
+# -----------------------------
+def run_all(sizes=SIZES, repeat=REPEAT, render=True, only=None):
+    results = []
+    frontend = None
+    if render:
+        import frontend
+    for n in sizes:
+        for name, fn in BACKEND_BENCHES:
+            if only and name not in only:
+                continue
+            results.append(_summary(name, n, fn(n, repeat)))
+        if frontend is not None:
+            for name, fn in RENDER_BENCHES:
+                if only and name not in only:
+                    continue
+                results.append(_summary(name, n, fn(frontend, n, repeat)))
+    return results
+
+
+def make_report(results, repeat):
+    try:
+        import pygame
+        pygame_version = pygame.version.ver
+    except ImportError:
+        pygame_version = None
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "pygame": pygame_version,
+            "platform": platform.platform(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "seed": SEED,
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+
+
+def compare(report, baseline, threshold=REGRESSION_THRESHOLD):
+    """
+    Compara as medianas com as da base (mesmo bench e mesmo n).
+    Acrescenta 'baseline_median_us', 'ratio' e 'regression' a cada resultado
+    e devolve a lista dos que regrediram.
+    """
+    base = {(r["bench"], r["n"]): r for r in baseline.get("results", ())}
+    regressions = []
+    for r in report["results"]:
+        old = base.get((r["bench"], r["n"]))
+        if old is None or old["median_us"] <= 0:
+            continue
+        ratio = r["median_us"] / old["median_us"]
+        r["baseline_median_us"] = old["median_us"]
+        r["ratio"] = round(ratio, 3)
+        r["regression"] = ratio > 1.0 + threshold
+        if r["regression"]:
+            regressions.append(r)
+    report["meta"]["threshold"] = threshold
+    return regressions
+
+
+def format_table(results):
+    lines = [f"{'bench':<38}{'n':>7}{'mediana(us)':>14}{'min(us)':>12}{'vs base':>10}"]
+    for r in results:
+        ratio = f"{r['ratio']:.2f}x" if "ratio" in r else "-"
+        if r.get("regression"):
+            ratio += " !"
+        lines.append(f"{r['bench']:<38}{r['n']:>7}{r['median_us']:>14.1f}{r['min_us']:>12.1f}{ratio:>10}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks sem janela do jogo.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(SIZES))
+    parser.add_argument("--repeat", type=int, default=REPEAT)
+    parser.add_argument("--only", nargs="+", help="só estes benchmarks")
+    parser.add_argument("--no-render", action="store_true", help="pula draw_ui e mainloop_frame")
+    parser.add_argument("--output", default="bench_report.json")
+    parser.add_argument("--baseline", help="relatório JSON anterior para comparar")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD)
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args(argv)
+
+    results = run_all(args.sizes, args.repeat, render=not args.no_render, only=args.only)
+    report = make_report(results, args.repeat)
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), args.threshold)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    print(format_table(report["results"]))
+    print(f"\nrelatório: {args.output}")
+    if regressions:
+        print(f"{len(regressions)} regressão(ões) acima de {args.threshold:.0%}:")
+        for r in regressions:
+            print(f"  {r['bench']} n={r['n']}: {r['ratio']:.2f}x")
+        if args.fail_on_regression:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
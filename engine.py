@@ -0,0 +1,1653 @@
+# engine.py
+# Lógica do jogo em Python puro: parsing, geração de peças, empacotamento,
+# anulação, detecção de solução e equações aleatórias.
+# Não importa pygame e não guarda estado de jogo no módulo — todo o estado
+# vive num Session, então dá para simular muitas partidas sem SDL.
+
+import random
+import re
+from collections import deque
+from array import array
+from functools import lru_cache
+
+# Configurações (valores usados pelo frontend também)
+WIDTH, HEIGHT = 1100, 700
+FPS = 60
+
+# Layout
+MARGIN = 20
+SIDE_W = (WIDTH - 3 * MARGIN) // 2
+LEFT_X = MARGIN
+RIGHT_X = LEFT_X + SIDE_W + MARGIN
+AREA_Y = 180
+AREA_H = HEIGHT - AREA_Y - MARGIN - 80
+
+# Piece sizes
+PIECE_SIZE = 50
+PIECE_GAP = 8
+
+# "order": pareia na ordem das peças (comportamento original)
+# "nearest": pareia cada peça com a oposta mais próxima na ordem da grade
+ANNIHILATION_PAIRING = "order"
+
+# confere os totais contra recontagem a cada empacotamento
+DEBUG_CHECKS = False
+
+# Peças agregadas ("pilhas"): coeficientes acima de STACK_MIN viram barras
+# de STACK_SIZES unidades em vez de uma peça por unidade. A escala 1-5-10
+# deixa o número de peças logarítmico no coeficiente (no máximo 5 por casa
+# decimal); a maior pilha cabe no campo de 16 bits do snapshot.
+STACK_SIZES = (50000, 10000, 5000, 1000, 500, 100, 50, 10, 5)
+STACK_MIN = 10
+
+# maior |coeficiente| aceito numa jogada ("load"): acima disso, pilhas de
+# STACK_SIZES[0] voltariam a crescer linearmente
+MAX_COEF = 10 ** 6
+
+# Bolhas de anulação: capacidade fixa do pool e duração de cada bolha
+PARTICLE_CAPACITY = 1024
+BUBBLE_DUR = 0.5
+
+# relayout completo vetorizado (NumPy, se instalado) a partir deste número de peças
+VECTOR_LAYOUT_MIN = 256
+
+# Desfazer/refazer: quantas ações ficam no histórico (as mais antigas saem)
+HISTORY_LIMIT = 200
+
+# Divisão exata: hash aditivo de 64 bits do conteúdo de cada subdivisão
+BALANCE_MASK = (1 << 64) - 1
+
+# maior divisor aceito (acima disso as faixas ficam finas demais para soltar peças)
+MAX_DIVISOES = 100
+
+
+# -----------------------------
+# Retângulo leve (substitui pygame.Rect)
+# -----------------------------
+class Rect:
+    """Só o que o jogo usa de pygame.Rect: posição, tamanho, centro e colisão com ponto."""
+    __slots__ = ("x", "y", "w", "h")
+
+    def __init__(self, x, y, w, h):
+        self.x = x
+        self.y = y
+        self.w = w
+        self.h = h
+
+    def __repr__(self):
+        return f"Rect({self.x}, {self.y}, {self.w}, {self.h})"
+
+    def __eq__(self, other):
+        return (self.x, self.y, self.w, self.h) == (other[0], other[1], other[2], other[3])
+
+    def __iter__(self):
+        return iter((self.x, self.y, self.w, self.h))
+
+    def __getitem__(self, i):
+        return (self.x, self.y, self.w, self.h)[i]
+
+    def __len__(self):
+        return 4
+
+    @property
+    def size(self):
+        return (self.w, self.h)
+
+    @property
+    def topleft(self):
+        return (self.x, self.y)
+
+    @property
+    def centerx(self):
+        return self.x + self.w // 2
+
+    @property
+    def centery(self):
+        return self.y + self.h // 2
+
+    @property
+    def center(self):
+        return (self.x + self.w // 2, self.y + self.h // 2)
+
+    def collidepoint(self, *pos):
+        px, py = pos[0] if len(pos) == 1 else pos
+        return self.x <= px < self.x + self.w and self.y <= py < self.y + self.h
+
+
+# -----------------------------
+# Registro de termos (tipos de peça)
+# -----------------------------
+class Term:
+    """
+    Um tipo de peça (monômio): nome interno, símbolo ("" na constante),
+    ordem de exibição (menor primeiro) e cores das peças + e -.
+    """
+    __slots__ = ("name", "symbol", "rank", "color_pos", "color_neg")
+
+    def __init__(self, name, symbol, rank, color_pos, color_neg):
+        self.name = name
+        self.symbol = symbol
+        self.rank = rank
+        self.color_pos = color_pos
+        self.color_neg = color_neg
+
+    @property
+    def unit_label(self):
+        return self.symbol or "1"
+
+    def label(self, count=1):
+        """Texto da peça: "x", "1", ou a pilha "10x", "10"."""
+        return self.unit_label if count == 1 else f"{count}{self.symbol}"
+
+    def color(self, sign):
+        return self.color_pos if sign > 0 else self.color_neg
+
+
+TERMS = {}        # nome -> Term, em ordem de registro (o snapshot usa essa ordem)
+TERM_ORDER = []   # nomes em ordem de exibição (grau maior primeiro)
+
+
+def register_term(name, symbol, rank, color_pos, color_neg):
+    """Registra um tipo de peça; paleta, anulação e formatação passam a aceitá-lo."""
+    term = TERMS[name] = Term(name, symbol, rank, color_pos, color_neg)
+    TERM_ORDER[:] = sorted(TERMS, key=lambda n: TERMS[n].rank)
+    return term
+
+
+register_term("x", "x", 20, (58, 120, 255), (201, 42, 42))     # azul forte / vermelho escuro
+register_term("n", "", 90, (52, 199, 89), (255, 127, 0))       # verde forte / laranja queimado
+register_term("x2", "x²", 0, (142, 68, 173), (236, 64, 122))   # roxo / rosa
+register_term("xy", "xy", 10, (63, 81, 181), (194, 24, 91))    # índigo / magenta
+register_term("y", "y", 30, (0, 150, 136), (121, 85, 72))      # verde-azulado / marrom
+
+
+# Botões da paleta (rects criados aqui — frontend desenha)
+PALETTE_BTN_W = 58
+PALETTE_BTN_H = 58
+PALETTE_X = 500
+PALETTE_Y = 100
+PALETTE_STEP = 80
+PALETTE_TERMS = ("n", "x")   # o currículo linear; ex.: ("n", "x", "x2") para quadráticas
+
+
+def build_palette(names=PALETTE_TERMS):
+    """Um botão + e um - por termo; com muitos termos os botões estreitam."""
+    step = min(PALETTE_STEP, (WIDTH - MARGIN - PALETTE_X) // (2 * len(names)))
+    w = min(PALETTE_BTN_W, step - 6)
+    buttons = []
+    for name in names:
+        term = TERMS[name]
+        for sign in (1, -1):
+            x = PALETTE_X + len(buttons) * step
+            buttons.append({"label": ("+" if sign > 0 else "-") + term.unit_label,
+                            "type": name, "sign": sign,
+                            "rect": Rect(x, PALETTE_Y, w, PALETTE_BTN_H)})
+    return buttons
+
+
+palette = build_palette()
+
+
+def set_palette_terms(names):
+    """Troca os termos da paleta (antes do primeiro frame: o fundo fica em cache)."""
+    palette[:] = build_palette(names)
+
+
+# -----------------------------
+# Índice espacial (grade uniforme)
+# -----------------------------
+class SpatialGrid:
+    """
+    Hash espacial alinhado à grade do pack_pieces: células de
+    PIECE_SIZE + PIECE_GAP com origem na primeira coluna de cada lado.
+    Cada peça fica registrada nas (no máximo 4) células que seu rect toca,
+    então "o que está sob este ponto" olha uma única célula.
+    """
+    CELL = PIECE_SIZE + PIECE_GAP
+    ORIGIN_X = {"left": LEFT_X + 20, "right": RIGHT_X + 20}
+    ORIGIN_Y = AREA_Y + 10
+    MID_X = LEFT_X + SIDE_W + MARGIN // 2   # linha do '=' separa as duas grades
+
+    def __init__(self):
+        self._cells = {}
+        self._keys = {}
+
+    def _cells_for(self, rect):
+        cell = self.CELL
+        x0, x1 = rect.x, rect.x + rect.w - 1
+        r0 = (rect.y - self.ORIGIN_Y) // cell
+        r1 = (rect.y + rect.h - 1 - self.ORIGIN_Y) // cell
+        keys = []
+        for side, lo, hi in (("left", x0, min(x1, self.MID_X - 1)),
+                             ("right", max(x0, self.MID_X), x1)):
+            if lo > hi:
+                continue
+            ox = self.ORIGIN_X[side]
+            for c in range((lo - ox) // cell, (hi - ox) // cell + 1):
+                for r in range(r0, r1 + 1):
+                    keys.append((side, c, r))
+        return tuple(keys)
+
+    def insert(self, pid, rect):
+        keys = self._cells_for(rect)
+        self._keys[pid] = keys
+        for k in keys:
+            cell = self._cells.get(k)
+            if cell is None:
+                self._cells[k] = {pid}
+            else:
+                cell.add(pid)
+
+    def remove(self, pid):
+        for k in self._keys.pop(pid, ()):
+            cell = self._cells[k]
+            cell.discard(pid)
+            if not cell:
+                del self._cells[k]
+
+    def update(self, pid, rect):
+        keys = self._cells_for(rect)
+        if keys == self._keys.get(pid):
+            return
+        self.remove(pid)
+        self.insert(pid, rect)
+
+    def clear(self):
+        self._cells = {}
+        self._keys = {}
+
+    def at(self, x, y):
+        """Ids registrados na célula que contém (x, y)."""
+        side = "left" if x < self.MID_X else "right"
+        cell = self.CELL
+        key = (side, (x - self.ORIGIN_X[side]) // cell, (y - self.ORIGIN_Y) // cell)
+        return self._cells.get(key, ())
+
+
+# -----------------------------
+# Armazenamento de peças
+# -----------------------------
+class Piece:
+    """
+    Peça compacta (sem dict por instância).
+    rect guarda a posição na tela; sub é o índice da subdivisão;
+    count é quantas unidades a peça vale (1, ou uma pilha ×5, ×10...).
+    """
+    __slots__ = ("id", "type", "sign", "side", "sub", "rect", "offset", "dragging", "gpos", "count")
+
+    def __init__(self, pid, ptype, sign, side, sub, rect, count=1):
+        self.id = pid
+        self.type = ptype
+        self.sign = sign
+        self.side = side
+        self.sub = sub
+        self.rect = rect
+        self.count = count
+        self.offset = (0, 0)
+        self.dragging = False
+        self.gpos = 0        # posição dentro do grupo (side, sub)
+
+
+def piece_record(piece):
+    """(id, tipo, sinal, lado, sub, contagem): o que basta para recriar a peça."""
+    return (piece.id, piece.type, piece.sign, piece.side, piece.sub, piece.count)
+
+
+_balance_weights = {}
+
+def _balance_weight(key):
+    """Peso pseudoaleatório fixo de (lado, tipo, sinal) — o mesmo em todo processo."""
+    w = _balance_weights.get(key)
+    if w is None:
+        w = _balance_weights[key] = random.Random(repr(key)).getrandbits(64) | 1
+    return w
+
+
+class PieceStore:
+    """
+    Lista de peças com índice id -> posição.
+    Busca por id e remoção são O(1) (a remoção troca com a última peça).
+    A ordem de iteração é a ordem de desenho.
+
+    Também mantém totais (em unidades) por (side, type, sign) e por
+    (side, sub, type, sign), atualizados a cada add/remove/move/set_count —
+    ler a equação não percorre as peças. side_count conta peças, não unidades.
+    Com a tela dividida, cada subdivisão tem ainda um hash aditivo do seu
+    conteúdo, com a frequência de cada hash: balanced() responde em O(1).
+    Mudanças de lado/subdivisão devem passar por move(), e de posição por
+    place(), que mantém o índice espacial em dia.
+
+    Cada grupo (side, sub) guarda suas peças em ordem estável de encaixe;
+    _dirty marca, por grupo, a primeira posição que precisa ser reposicionada.
+
+    Com journal (uma lista) ligado, cada mudança lógica vira uma operação
+    ("add"/"remove", registro), ("move", id, lado, sub, lado novo, sub novo)
+    ou ("count", id, antes, depois) — é o delta usado pelo desfazer.
+    Posições (place) não entram: depois de desfazer, o pack as refaz.
+    """
+
+    def __init__(self):
+        self._items = []
+        self._slot = {}
+        self.grid = SpatialGrid()
+        self._groups = {}
+        self._dirty = {}
+        self._totals = {}
+        self._sub_totals = {}
+        self._side_counts = {"left": 0, "right": 0}
+        self._poly = {"left": {}, "right": {}}
+        self._sub_hash = None   # sub -> hash do conteúdo (só subs não vazias); None = desligado
+        self._hash_freq = None  # hash -> quantas subs têm esse hash
+        self.journal = None
+
+    def _count(self, piece, delta):
+        units = delta * piece.count
+        key = (piece.side, piece.type, piece.sign)
+        self._totals[key] = self._totals.get(key, 0) + units
+        skey = (piece.side, piece.sub, piece.type, piece.sign)
+        n = self._sub_totals.get(skey, 0) + units
+        if n:
+            self._sub_totals[skey] = n
+        else:
+            self._sub_totals.pop(skey, None)
+        self._side_counts[piece.side] += delta
+        poly = self._poly[piece.side]
+        v = poly.get(piece.type, 0) + piece.sign * units
+        if v:
+            poly[piece.type] = v
+        else:
+            poly.pop(piece.type, None)
+        # hash da subdivisão: soma de unidades x peso de (lado, tipo, sinal)
+        hashes = self._sub_hash
+        if hashes is None:
+            return
+        freq = self._hash_freq
+        old = hashes.get(piece.sub, 0)
+        new = (old + units * (_balance_weights.get(key) or _balance_weight(key))) & BALANCE_MASK
+        if old:
+            if freq[old] == 1:
+                del freq[old]
+            else:
+                freq[old] -= 1
+        if new:
+            hashes[piece.sub] = new
+            freq[new] = freq.get(new, 0) + 1
+        else:
+            hashes.pop(piece.sub, None)
+
+    # --- grupos (side, sub) em ordem de encaixe ---
+    def _mark(self, key, index):
+        d = self._dirty.get(key)
+        if d is None or index < d:
+            self._dirty[key] = index
+
+    def _group_add(self, piece):
+        key = (piece.side, piece.sub)
+        group = self._groups.get(key)
+        if group is None:
+            group = self._groups[key] = []
+        piece.gpos = len(group)
+        group.append(piece)
+        self._mark(key, piece.gpos)
+
+    def _group_remove(self, piece):
+        key = (piece.side, piece.sub)
+        group = self._groups[key]
+        i = piece.gpos
+        del group[i]
+        for j in range(i, len(group)):
+            group[j].gpos = j
+        self._mark(key, i)
+
+    def groups(self):
+        return self._groups
+
+    def take_dirty(self):
+        """Devolve {(side, sub): primeira posição suja} e limpa as marcas."""
+        dirty = self._dirty
+        self._dirty = {}
+        return dirty
+
+    def __len__(self):
+        return len(self._items)
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def __reversed__(self):
+        return reversed(self._items)
+
+    def __contains__(self, pid):
+        return pid in self._slot
+
+    def get(self, pid):
+        slot = self._slot.get(pid)
+        return None if slot is None else self._items[slot]
+
+    def add(self, piece):
+        self._slot[piece.id] = len(self._items)
+        self._items.append(piece)
+        self._count(piece, 1)
+        self._group_add(piece)
+        self.grid.insert(piece.id, piece.rect)
+        if self.journal is not None:
+            self.journal.append(("add", piece_record(piece)))
+        return piece
+
+    def load(self, pieces):
+        """
+        Troca o conteúdo por peças já posicionadas (ex.: de um snapshot), em
+        ordem de desenho e com gpos = posição no grupo. Nada fica sujo.
+        """
+        self.clear()
+        groups = self._groups
+        for piece in pieces:
+            self._slot[piece.id] = len(self._items)
+            self._items.append(piece)
+            self._count(piece, 1)
+            key = (piece.side, piece.sub)
+            group = groups.get(key)
+            if group is None:
+                group = groups[key] = []
+            group.append(piece)
+            self.grid.insert(piece.id, piece.rect)
+        for group in groups.values():
+            group.sort(key=lambda p: p.gpos)
+            for i, p in enumerate(group):
+                p.gpos = i
+
+    def remove(self, pid):
+        slot = self._slot.pop(pid, None)
+        if slot is None:
+            return None
+        items = self._items
+        piece = items[slot]
+        last = items.pop()
+        if last is not piece:
+            items[slot] = last
+            self._slot[last.id] = slot
+        self._count(piece, -1)
+        self._group_remove(piece)
+        self.grid.remove(pid)
+        if self.journal is not None:
+            self.journal.append(("remove", piece_record(piece)))
+        return piece
+
+    def remove_many(self, ids):
+        """Remove várias peças de uma vez, reconstruindo a lista uma única vez."""
+        ids = set(ids) & self._slot.keys()
+        if not ids:
+            return 0
+        touched = set()
+        journal = self.journal
+        for pid in ids:
+            piece = self._items[self._slot[pid]]
+            if journal is not None:
+                journal.append(("remove", piece_record(piece)))
+            self._count(piece, -1)
+            self.grid.remove(pid)
+            key = (piece.side, piece.sub)
+            touched.add(key)
+            self._mark(key, piece.gpos)
+        for key in touched:
+            group = [p for p in self._groups[key] if p.id not in ids]
+            for j in range(self._dirty[key], len(group)):
+                group[j].gpos = j
+            self._groups[key] = group
+        self._items = [p for p in self._items if p.id not in ids]
+        self._slot = {p.id: i for i, p in enumerate(self._items)}
+        return len(ids)
+
+    def _check_member(self, piece):
+        # peça velha (ex.: de antes de uma nova equação) estragaria os totais
+        slot = self._slot.get(piece.id)
+        if slot is None or self._items[slot] is not piece:
+            raise ValueError(f"peça {piece.id} não está no tabuleiro")
+
+    def move(self, piece, side, sub):
+        """
+        Muda lado/subdivisão de uma peça mantendo os totais em dia.
+        No mesmo grupo, só marca a peça para voltar ao seu lugar.
+        """
+        self._check_member(piece)
+        if piece.side == side and piece.sub == sub:
+            self._mark((side, sub), piece.gpos)
+            return
+        if self.journal is not None:
+            self.journal.append(("move", piece.id, piece.side, piece.sub, side, sub))
+        self._count(piece, -1)
+        self._group_remove(piece)
+        piece.side = side
+        piece.sub = sub
+        self._count(piece, 1)
+        self._group_add(piece)
+
+    def move_many(self, moves):
+        """
+        Vários move() de uma vez: (peça, lado, sub). Totais e journal peça a
+        peça, mas os grupos tocados são refeitos uma vez só, mantendo a ordem
+        de encaixe de cada grupo de origem — O(peças desses grupos).
+        """
+        journal = self.journal
+        touched = set()
+        for piece, side, sub in moves:
+            self._check_member(piece)
+            touched.add((piece.side, piece.sub))
+            if piece.side == side and piece.sub == sub:
+                continue
+            if journal is not None:
+                journal.append(("move", piece.id, piece.side, piece.sub, side, sub))
+            self._count(piece, -1)
+            piece.side = side
+            piece.sub = sub
+            self._count(piece, 1)
+            touched.add((side, sub))
+        new = {key: [] for key in touched}
+        for key in sorted(touched):
+            for p in self._groups.get(key, ()):
+                new[(p.side, p.sub)].append(p)
+        for key, group in new.items():
+            for j, p in enumerate(group):
+                p.gpos = j
+            self._groups[key] = group
+            self._mark(key, 0)
+
+    def set_count(self, piece, count):
+        """Muda quantas unidades a peça vale (count >= 1)."""
+        self._check_member(piece)
+        if self.journal is not None:
+            self.journal.append(("count", piece.id, piece.count, count))
+        self._count(piece, -1)
+        piece.count = count
+        self._count(piece, 1)
+
+    def place(self, piece, x, y):
+        """Muda a posição de uma peça e atualiza o índice espacial."""
+        r = piece.rect
+        if r.x == x and r.y == y:
+            return
+        r.x = x
+        r.y = y
+        self.grid.update(piece.id, r)
+
+    def piece_at(self, x, y):
+        """Peça mais ao topo (última desenhada) sob o ponto, ou None — O(1)."""
+        best = None
+        best_slot = -1
+        for pid in self.grid.at(x, y):
+            slot = self._slot[pid]
+            if slot > best_slot and self._items[slot].rect.collidepoint(x, y):
+                best = self._items[slot]
+                best_slot = slot
+        return best
+
+    def clear(self):
+        if self.journal is not None:
+            self.journal.extend(("remove", piece_record(p)) for p in self._items)
+        self._items = []
+        self._slot = {}
+        self.grid.clear()
+        self._groups = {}
+        self._dirty = {}
+        self._totals = {}
+        self._sub_totals = {}
+        self._side_counts = {"left": 0, "right": 0}
+        self._poly = {"left": {}, "right": {}}
+        if self._sub_hash is not None:
+            self._sub_hash = {}
+            self._hash_freq = {}
+
+    # --- totais (O(1)) ---
+    def total(self, side, ptype, sign):
+        return self._totals.get((side, ptype, sign), 0)
+
+    def sub_total(self, side, sub, ptype, sign):
+        return self._sub_totals.get((side, sub, ptype, sign), 0)
+
+    def side_count(self, side):
+        return self._side_counts[side]
+
+    def net(self, side, ptype):
+        return self._poly[side].get(ptype, 0)
+
+    def polynomial(self, side):
+        """Termos não nulos do lado: {tipo: unidades líquidas} (cópia; esparso)."""
+        return dict(self._poly[side])
+
+    @staticmethod
+    def _balance_hashes(sub_totals):
+        """(hash por sub não vazia, frequência de cada hash) a partir dos totais."""
+        hashes = {}
+        for (side, sub, ptype, sign), v in sub_totals.items():
+            hashes[sub] = (hashes.get(sub, 0) + v * _balance_weight((side, ptype, sign))) & BALANCE_MASK
+        hashes = {sub: h for sub, h in hashes.items() if h}
+        freq = {}
+        for h in hashes.values():
+            freq[h] = freq.get(h, 0) + 1
+        return hashes, freq
+
+    def track_balance(self, on):
+        """Liga (recalculando dos totais, O(chaves)) ou desliga os hashes das subdivisões."""
+        if not on:
+            self._sub_hash = self._hash_freq = None
+        elif self._sub_hash is None:
+            self._sub_hash, self._hash_freq = self._balance_hashes(self._sub_totals)
+
+    def balanced(self, subs):
+        """
+        As subdivisões 0..subs-1 têm todas o mesmo conteúdo (unidades por
+        lado, tipo e sinal), sem nenhuma vazia? O(1) pelos hashes (ligados
+        aqui na primeira chamada); um "sim" é confirmado pelos totais por
+        subdivisão, para não depender do hash.
+        """
+        self.track_balance(True)
+        freq = self._hash_freq
+        if len(freq) != 1 or next(iter(freq.values())) != subs:
+            return False
+        per_sub = [{} for _ in range(subs)]
+        for (side, sub, ptype, sign), v in self._sub_totals.items():
+            if sub >= subs:
+                return False
+            per_sub[sub][(side, ptype, sign)] = v
+        return all(content == per_sub[0] for content in per_sub)
+
+    def recount(self):
+        """Recontagem completa (O(n)) — usada só para conferência."""
+        totals = {}
+        sub_totals = {}
+        for p in self._items:
+            key = (p.side, p.type, p.sign)
+            totals[key] = totals.get(key, 0) + p.count
+            skey = (p.side, p.sub, p.type, p.sign)
+            sub_totals[skey] = sub_totals.get(skey, 0) + p.count
+        return totals, sub_totals
+
+    def check_totals(self):
+        """Compara os totais incrementais com uma recontagem; levanta AssertionError se divergirem."""
+        totals, sub_totals = self.recount()
+        mine = {k: v for k, v in self._totals.items() if v}
+        if mine != totals or self._sub_totals != sub_totals:
+            raise AssertionError(
+                f"Totais inconsistentes: {mine} / {self._sub_totals} != {totals} / {sub_totals}")
+        sides = {"left": 0, "right": 0}
+        for p in self._items:
+            sides[p.side] += 1
+        if sides != self._side_counts:
+            raise AssertionError(f"Contagem por lado inconsistente: {self._side_counts} != {sides}")
+        poly = {"left": {}, "right": {}}
+        for (side, ptype, sign), v in totals.items():
+            poly[side][ptype] = poly[side].get(ptype, 0) + sign * v
+        poly = {side: {t: v for t, v in terms.items() if v} for side, terms in poly.items()}
+        if poly != self._poly:
+            raise AssertionError(f"Polinômios inconsistentes: {self._poly} != {poly}")
+        if self._sub_hash is not None:
+            hashes, freq = self._balance_hashes(sub_totals)
+            if hashes != self._sub_hash or freq != self._hash_freq:
+                raise AssertionError(f"Hashes das subdivisões inconsistentes: {self._sub_hash} != {hashes}")
+        in_groups = 0
+        for key, group in self._groups.items():
+            for j, p in enumerate(group):
+                if (p.side, p.sub) != key or p.gpos != j:
+                    raise AssertionError(f"Grupo {key} inconsistente na posição {j} (peça {p.id})")
+            in_groups += len(group)
+        if in_groups != len(self._items):
+            raise AssertionError(f"{in_groups} peças nos grupos, {len(self._items)} no total")
+        return True
+
+
+# -----------------------------
+# Funções utilitárias (parsing e equações)
+# -----------------------------
+# tokenizador único, compilado uma vez: sinal, dígitos (vários) e x opcional
+_TERM_RE = re.compile(r'([+-])(\d*)(x?)')
+_SIDE_RE = re.compile(r'(?:[+-](?:\d+x?|x))*')   # todo sinal seguido de número ou x
+PARSE_CACHE_SIZE = 4096
+
+
+def normalize_equation(eq_text):
+    """Forma canônica do texto: sem espaços, minúsculo, '−' vira '-'."""
+    return "".join(eq_text.split()).lower().replace("\u2212", "-")
+
+
+def parse_linear_side(side_text):
+    text = normalize_equation(side_text)
+    if text == "":
+        return 0, 0
+    if text[0] not in "+-":
+        text = "+" + text
+    if not _SIDE_RE.fullmatch(text):
+        raise ValueError(f"Lado inválido: {side_text!r}")
+    coef = 0
+    const = 0
+    for sign, num, hasx in _TERM_RE.findall(text):
+        s = 1 if sign == "+" else -1
+        if hasx:
+            val = int(num) if num != "" else 1
+            coef += s * val
+        else:
+            if num != "":
+                const += s * int(num)
+    return coef, const
+
+def parse_equation(eq_text):
+    return _parse_normalized(normalize_equation(eq_text))
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def _parse_normalized(text):
+    # memo pela forma normalizada: "2x+1=3" e "2x + 1 = 3" são a mesma entrada
+    parts = text.split("=")
+    if len(parts) != 2:
+        raise ValueError("Equação deve ter exatamente um '='")
+    aL, bL = parse_linear_side(parts[0])
+    aR, bR = parse_linear_side(parts[1])
+    return aL, bL, aR, bR
+
+def solved_value(aL, bL, aR, bR, x_left=None, x_right=None):
+    """
+    Valor de x se a equação está resolvida, senão None. x_left/x_right são
+    as unidades de x (+ e -) de cada lado; sem elas, |aL| e |aR| (estado
+    líquido, como o do solver). Resolvido = um único x num lado, nenhum no
+    outro, e solução inteira.
+    """
+    if x_left is None:
+        x_left, x_right = abs(aL), abs(aR)
+    if not ((x_left == 1 and x_right == 0) or (x_right == 1 and x_left == 0)):
+        return None
+    coef = aL - aR
+    rhs = bR - bL
+    if coef == 0 or rhs % coef != 0:
+        return None
+    return rhs // coef
+
+
+def format_polynomial(poly):
+    """{tipo: coeficiente} -> texto, termos na ordem do registro ("x² -2x +3")."""
+    parts = []
+    for name in TERM_ORDER:
+        c = poly.get(name, 0)
+        if c == 0:
+            continue
+        symbol = TERMS[name].symbol
+        if symbol and abs(c) == 1:
+            text = ("-" if c < 0 else "") + symbol
+        else:
+            text = f"{c}{symbol}"
+        parts.append(("+" if c > 0 and len(parts) > 0 else "") + text)
+    if len(parts) == 0:
+        return "0"
+    return " ".join(parts)
+
+
+def format_side(a, b):
+    return format_polynomial({"x": a, "n": b})
+
+
+# -----------------------------
+# Geração de equações (amostragem direta)
+# -----------------------------
+# Limites padrão das equações aleatórias: solução, coeficientes de x,
+# constante da esquerda, |valor| máximo de cada termo e total de peças.
+EQUATION_LIMITS = {
+    "x_range": (-5, 5),
+    "coef_range": (-3, 3),
+    "b_range": (-5, 5),
+    "max_abs": 6,
+    "max_total": 24,
+}
+
+@lru_cache(maxsize=32)
+def equation_table(x_range=(-5, 5), coef_range=(-3, 3), b_range=(-5, 5), max_abs=6, max_total=24):
+    """
+    Todas as tuplas (coefL, bL, coefR, bR, x0) que respeitam os limites.
+    Sortear uniformemente nesta tabela dá a mesma distribuição da antiga
+    amostragem por rejeição, sem tentativas descartadas.
+    """
+    table = []
+    for x0 in range(x_range[0], x_range[1] + 1):
+        for coefL in range(coef_range[0], coef_range[1] + 1):
+            for coefR in range(coef_range[0], coef_range[1] + 1):
+                coef = coefL - coefR
+                if coef == 0 or abs(coefL) > max_abs or abs(coefR) > max_abs:
+                    continue
+                for bL in range(b_range[0], b_range[1] + 1):
+                    bR = bL + coef * x0
+                    if abs(bL) > max_abs or abs(bR) > max_abs:
+                        continue
+                    if abs(coefL) + abs(bL) + abs(coefR) + abs(bR) > max_total:
+                        continue
+                    table.append((coefL, bL, coefR, bR, x0))
+    return tuple(table)
+
+def equation_difficulty(eq):
+    """Dificuldade aproximada: peças no tabuleiro + peso extra para termos negativos."""
+    coefL, bL, coefR, bR, _ = eq
+    total = abs(coefL) + abs(bL) + abs(coefR) + abs(bR)
+    negatives = sum(1 for v in (coefL, bL, coefR, bR) if v < 0)
+    return total + 2 * negatives
+
+# pesos por nome; "uniform" não usa pesos
+DIFFICULTY_WEIGHTS = {
+    "easy": lambda eq: 1.0 / (1 + equation_difficulty(eq)),
+    "hard": lambda eq: float(equation_difficulty(eq)),
+}
+
+@lru_cache(maxsize=64)
+def _cum_weights(table, weight):
+    total = 0.0
+    cum = []
+    for eq in table:
+        total += DIFFICULTY_WEIGHTS[weight](eq)
+        cum.append(total)
+    return cum
+
+def generate_equations(n, constraints=None, seed=None, rng=None):
+    """
+    Sorteia n equações (coefL, bL, coefR, bR, x0) de uma vez.
+    constraints: dict com chaves de EQUATION_LIMITS e, opcionalmente,
+    "weight" ("uniform", "easy", "hard" ou uma função eq -> peso).
+    Levanta ValueError se nenhuma equação satisfaz os limites.
+    """
+    limits = dict(EQUATION_LIMITS)
+    weight = "uniform"
+    if constraints:
+        constraints = dict(constraints)
+        weight = constraints.pop("weight", weight)
+        unknown = set(constraints) - set(limits)
+        if unknown:
+            raise ValueError(f"Restrições desconhecidas: {sorted(unknown)}")
+        limits.update(constraints)
+    limits = {k: tuple(v) if isinstance(v, list) else v for k, v in limits.items()}
+
+    table = equation_table(**limits)
+    if not table:
+        raise ValueError("Nenhuma equação satisfaz as restrições")
+
+    if rng is None:
+        rng = random.Random(seed)
+    if weight == "uniform":
+        return rng.choices(table, k=n)
+    if callable(weight):
+        return rng.choices(table, weights=[weight(eq) for eq in table], k=n)
+    if weight not in DIFFICULTY_WEIGHTS:
+        raise ValueError(f"Peso desconhecido: {weight!r}")
+    return rng.choices(table, cum_weights=_cum_weights(table, weight), k=n)
+
+
+def stack_counts(units):
+    """
+    Quebra um coeficiente em peças: unidades soltas até STACK_MIN, acima
+    disso pilhas de STACK_SIZES (maiores primeiro) e o resto em unidades.
+    """
+    if units <= STACK_MIN:
+        return [1] * units
+    counts = []
+    for size in STACK_SIZES:
+        n, units = divmod(units, size)
+        counts.extend([size] * n)
+    counts.extend([1] * units)
+    return counts
+
+
+def poly_layout(left, right):
+    """
+    Peças que montam a equação left = right, prontas para Session.load_layout:
+    tupla de (tipo, sinal, lado, índice, contagem). left/right são sequências
+    de (tipo, coeficiente), na ordem em que as peças devem aparecer.
+    """
+    layout = []
+    for side, values in (('left', left), ('right', right)):
+        idx = 0
+        for ptype, value in values:
+            sign = 1 if value >= 0 else -1
+            for count in stack_counts(abs(value)):
+                layout.append((ptype, sign, side, idx, count))
+                idx += 1
+    return tuple(layout)
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def equation_layout(aL, bL, aR, bR):
+    """Layout da equação linear aL·x + bL = aR·x + bR (ver poly_layout)."""
+    return poly_layout((('x', aL), ('n', bL)), (('x', aR), ('n', bR)))
+
+
+# -----------------------------
+# Layout da grade (posição de cada encaixe)
+# -----------------------------
+LAYOUT_STEP = PIECE_SIZE + PIECE_GAP
+LAYOUT_COLS = 6
+
+def _base_x(side):
+    return (LEFT_X if side == "left" else RIGHT_X) + 20
+
+def _numpy():
+    # NumPy é opcional: só o relayout completo em lote usa
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+def _layout_bulk(groups, step_h):
+    """
+    Coordenadas de todas as peças de uma vez: índices dentro de cada grupo
+    viram (x, y) com aritmética de arrays. Retorna (peças, xs, ys).
+    """
+    np = _numpy()
+    order = []
+    counts = []
+    bases_x = []
+    bases_y = []
+    for (side, sub), group in groups.items():
+        if not group:
+            continue
+        order.extend(group)
+        counts.append(len(group))
+        bases_x.append(_base_x(side))
+        bases_y.append(AREA_Y + 10 + sub * step_h)
+
+    if np is None or len(order) < VECTOR_LAYOUT_MIN:
+        xs = []
+        ys = []
+        for n, bx, by in zip(counts, bases_x, bases_y):
+            for idx in range(n):
+                xs.append(int(bx + (idx % LAYOUT_COLS) * LAYOUT_STEP))
+                ys.append(int(by + (idx // LAYOUT_COLS) * LAYOUT_STEP))
+        return order, xs, ys
+
+    counts = np.asarray(counts)
+    starts = np.repeat(np.cumsum(counts) - counts, counts)
+    idx = np.arange(len(order)) - starts
+    xs = np.repeat(np.asarray(bases_x), counts) + (idx % LAYOUT_COLS) * LAYOUT_STEP
+    ys = np.repeat(np.asarray(bases_y, dtype=float), counts) + (idx // LAYOUT_COLS) * LAYOUT_STEP
+    return order, xs.astype(int).tolist(), ys.astype(int).tolist()
+
+
+# -----------------------------
+# Bolhas de anulação (pool de partículas)
+# -----------------------------
+class ParticlePool:
+    """
+    Pool de capacidade fixa em arrays paralelos (x, y, t, dur): as n
+    primeiras posições estão vivas. step() avança todas de uma vez (com
+    NumPy, se instalado) e remove as vencidas trocando com a última viva.
+    Quando o pool está cheio, bolhas novas são descartadas. Os arrays só
+    são alocados na primeira bolha; com capacity=0 nunca (sessões sem tela).
+    """
+
+    def __init__(self, capacity=PARTICLE_CAPACITY):
+        self.capacity = capacity
+        self.n = 0
+        self._np = None
+        self.x = self.y = self.t = self.dur = None
+
+    def _alloc(self):
+        capacity = self.capacity
+        np = _numpy()
+        self._np = np
+        if np is not None:
+            self.x = np.zeros(capacity)
+            self.y = np.zeros(capacity)
+            self.t = np.zeros(capacity)
+            self.dur = np.zeros(capacity)
+        else:
+            self.x = array('d', bytes(8 * capacity))
+            self.y = array('d', bytes(8 * capacity))
+            self.t = array('d', bytes(8 * capacity))
+            self.dur = array('d', bytes(8 * capacity))
+
+    def __len__(self):
+        return self.n
+
+    def spawn(self, x, y, dur=BUBBLE_DUR):
+        i = self.n
+        if i >= self.capacity:
+            return False
+        if self.x is None:
+            self._alloc()
+        self.x[i] = x
+        self.y[i] = y
+        self.t[i] = 0.0
+        self.dur[i] = dur
+        self.n = i + 1
+        return True
+
+    def _swap_remove(self, i):
+        last = self.n - 1
+        if i != last:
+            self.x[i] = self.x[last]
+            self.y[i] = self.y[last]
+            self.t[i] = self.t[last]
+            self.dur[i] = self.dur[last]
+        self.n = last
+
+    def step(self, dt):
+        n = self.n
+        if n == 0:
+            return
+        np = self._np
+        if np is not None:
+            t = self.t[:n]
+            t += dt
+            # de trás para frente: a última viva trocada para i nunca está vencida
+            for i in np.flatnonzero(t >= self.dur[:n])[::-1].tolist():
+                self._swap_remove(i)
+            return
+        # sem NumPy: de trás para frente, a última viva já foi avançada
+        # quando é trocada para a posição i
+        t = self.t
+        dur = self.dur
+        for i in range(n - 1, -1, -1):
+            t[i] += dt
+            if t[i] >= dur[i]:
+                self._swap_remove(i)
+
+    def clear(self):
+        self.n = 0
+
+    def snapshot(self):
+        """Listas (xs, ys, fracs) das bolhas vivas; frac vai de 0 a 1."""
+        n = self.n
+        if n == 0:
+            return [], [], []
+        np = self._np
+        if np is not None:
+            fracs = np.minimum(1.0, self.t[:n] / np.maximum(self.dur[:n], 1e-9))
+            return self.x[:n].tolist(), self.y[:n].tolist(), fracs.tolist()
+        fracs = [min(1.0, self.t[i] / self.dur[i]) if self.dur[i] > 0 else 1.0 for i in range(n)]
+        return list(self.x[:n]), list(self.y[:n]), fracs
+
+
+# -----------------------------
+# Anulação: regras de pareamento
+# -----------------------------
+# As regras trabalham em unidades: uma pilha de 5 contra uma de 3 anula 3
+# unidades e sobra uma pilha de 2. Retornam ([(a, b, unidades)], restante),
+# onde restante[id] é quanto sobra de cada peça tocada.
+def _pair_in_order(bucket):
+    positives = [p for p in bucket if p.sign > 0]
+    negatives = [p for p in bucket if p.sign < 0]
+    pairs = []
+    rest = {}
+    i = j = 0
+    while i < len(positives) and j < len(negatives):
+        a, b = positives[i], negatives[j]
+        ra = rest.get(a.id, a.count)
+        rb = rest.get(b.id, b.count)
+        k = min(ra, rb)
+        pairs.append((a, b, k))
+        rest[a.id] = ra - k
+        rest[b.id] = rb - k
+        if ra == k: i += 1
+        if rb == k: j += 1
+    return pairs, rest
+
+def _pair_nearest(bucket):
+    # ordena pela posição na grade (linha, coluna); uma pilha de peças do mesmo
+    # sinal casa cada peça com a oposta vizinha mais próxima — O(n log n)
+    bucket = sorted(bucket, key=lambda p: (p.rect.centery, p.rect.centerx))
+    stack = []
+    pairs = []
+    rest = {}
+    for p in bucket:
+        r = p.count
+        while r and stack and stack[-1].sign != p.sign:
+            top = stack[-1]
+            k = min(r, rest[top.id])
+            pairs.append((top, p, k))
+            rest[top.id] -= k
+            r -= k
+            if rest[top.id] == 0:
+                stack.pop()
+        rest[p.id] = r
+        if r:
+            stack.append(p)
+    return pairs, rest
+
+
+# -----------------------------
+# Validação das jogadas (Session.apply)
+# -----------------------------
+SIDES = ("left", "right")
+
+# jogada -> (nº mínimo e máximo de argumentos depois do nome)
+_MOVE_ARITY = {
+    "new": (0, 1), "load": (4, 4), "add": (2, 2), "move": (2, 3), "split": (1, 2),
+    "divide": (1, 1), "distribute": (0, 0), "clear": (0, 0), "annihilate": (0, 0),
+    "undo": (0, 0), "redo": (0, 0),
+}
+
+
+def _is_int(v):
+    return isinstance(v, int) and not isinstance(v, bool)
+
+
+def _check_move(move):
+    """Levanta ValueError se a jogada não tem a forma de _apply (tipos, lado, inteiros)."""
+    if not isinstance(move, (tuple, list)) or not move or move[0] not in _MOVE_ARITY:
+        raise ValueError(f"jogada desconhecida: {move!r}")
+    kind, args = move[0], move[1:]
+    lo, hi = _MOVE_ARITY[kind]
+    if not lo <= len(args) <= hi:
+        raise ValueError(f"jogada {kind!r} com {len(args)} argumentos")
+    if kind == "load":
+        ok = all(_is_int(v) and abs(v) <= MAX_COEF for v in args)
+    elif kind == "add":
+        ok = args[0] in TERMS and _is_int(args[1]) and args[1] in (1, -1)
+    elif kind == "move":
+        ok = _is_int(args[0]) and args[1] in SIDES and (len(args) < 3 or _is_int(args[2]))
+    elif kind == "split":
+        ok = _is_int(args[0]) and (len(args) < 2 or _is_int(args[1]))
+    elif kind == "divide":
+        ok = _is_int(args[0]) and 0 <= args[0] <= MAX_DIVISOES
+    else:
+        ok = True
+    if not ok:
+        raise ValueError(f"argumentos inválidos em {move!r}")
+
+
+# -----------------------------
+# Sessão (uma partida)
+# -----------------------------
+class Session:
+    """
+    Estado completo de uma partida: peças, próximo id, mensagem, divisões
+    visuais, animações e o gerador aleatório. Várias sessões convivem no
+    mesmo processo sem interferir umas nas outras.
+    """
+
+    def __init__(self, seed=None, pairing=ANNIHILATION_PAIRING, debug_checks=DEBUG_CHECKS,
+                 history_limit=HISTORY_LIMIT, particles=PARTICLE_CAPACITY):
+        self.pieces = PieceStore()
+        self.next_id = 1
+        self.message = ""
+        self.divisoes_visuais = 0   # quantas divisões visuais (1 == sem divisão)
+        self.animations = ParticlePool(particles)   # particles=0: sem bolhas (sem tela)
+        self.rng = random.Random(seed)
+        self.pairing = pairing
+        self.debug_checks = debug_checks
+        self._full_layout = True    # próximo pack refaz todos os grupos
+        self.history = deque(maxlen=history_limit)   # deltas para desfazer
+        self.redo_log = []                           # deltas desfeitos
+        self._action = None         # (divisões, next_id) no início da ação aberta
+
+    # -----------------------------
+    # Estado de peças e utilitários
+    # -----------------------------
+    def message_update(self, text):
+        self.message = text
+
+    def set_divisoes(self, n):
+        self.divisoes_visuais = max(0, min(int(n), MAX_DIVISOES))
+        # peças em subdivisões que deixaram de existir vão para a última
+        subs = max(1, self.divisoes_visuais)
+        for p in list(self.pieces):
+            if p.sub >= subs:
+                self.pieces.move(p, p.side, subs - 1)
+        if subs == 1:
+            self.pieces.track_balance(False)   # sem divisão não há o que conferir
+        self._full_layout = True
+
+    def _clamp_sub(self, sub):
+        subs = max(1, self.divisoes_visuais)
+        sub = int(sub)
+        if sub < 0: sub = 0
+        if sub >= subs: sub = subs - 1
+        return sub
+
+    def clear_pieces(self):
+        self.pieces.clear()
+        self.next_id = 1
+        self._full_layout = True
+
+    def add_piece(self, ptype, sign, side, index=None, x=None, y=None, sub=0, count=1):
+        """
+        Adiciona peça. sub é o índice da subdivisão (default 0);
+        count > 1 cria uma pilha que vale count unidades.
+        """
+        if ptype not in TERMS:
+            raise ValueError(f"tipo de peça não registrado: {ptype!r}")
+        if x is None or y is None:
+            col = index % 6 if index is not None else 0
+            row = (index // 6) if index is not None else 0
+            if side == "left":
+                x = LEFT_X + 20 + col * (PIECE_SIZE + PIECE_GAP)
+                y = AREA_Y + 20 + row * (PIECE_SIZE + PIECE_GAP)
+            else:
+                x = RIGHT_X + 20 + col * (PIECE_SIZE + PIECE_GAP)
+                y = AREA_Y + 20 + row * (PIECE_SIZE + PIECE_GAP)
+
+        rect = Rect(int(x), int(y), PIECE_SIZE, PIECE_SIZE)
+
+        piece = self.pieces.add(Piece(self.next_id, ptype, sign, side, self._clamp_sub(sub), rect, count))
+        self.next_id += 1
+        return piece
+
+    def move_piece(self, piece, side, sub=0):
+        """Move uma peça para outro lado/subdivisão (atualiza os totais)."""
+        self.pieces.move(piece, side, self._clamp_sub(sub))
+
+    # -----------------------------
+    # Divisão exata
+    # -----------------------------
+    def is_balanced(self):
+        """Tela dividida e todas as subdivisões com o mesmo conteúdo? O(1)."""
+        subs = self.divisoes_visuais
+        return subs > 1 and self.pieces.balanced(subs)
+
+    def collapse_division(self):
+        """
+        Se as subdivisões estão iguais, a divisão está feita: fica só a
+        primeira (cada lado dividido por n) e as outras somem em bolhas.
+        Retorna n, ou 0 se ainda não estão iguais.
+        """
+        if not self.is_balanced():
+            return 0
+        n = self.divisoes_visuais
+        removed = []
+        spawn = self.animations.spawn
+        for p in self.pieces:
+            if p.sub != 0:
+                removed.append(p.id)
+                spawn(p.rect.centerx, p.rect.centery)
+        self.pieces.remove_many(removed)
+        self.set_divisoes(0)
+        self.pack_pieces()
+        self.message_update(f"Dividido por {n}! Cada lado ficou com uma parte.")
+        return n
+
+    def distribute(self):
+        """
+        Reparte as peças igualmente entre as subdivisões numa passada só:
+        calcula o destino de cada peça (quebrando pilhas onde preciso), move
+        todas com um único refazer dos grupos e reempacota uma vez, em lote.
+        Depois junta o resultado (collapse_division). False se não há
+        divisão ou se algum total não é múltiplo de n.
+        """
+        n = self.divisoes_visuais
+        if n <= 1:
+            self.message_update("Divida a tela primeiro.")
+            return False
+        pieces = self.pieces
+        buckets = {}
+        for p in pieces:
+            key = (p.side, p.type, p.sign)
+            bucket = buckets.get(key)
+            if bucket is None:
+                buckets[key] = [p]
+            else:
+                bucket.append(p)
+        for key in buckets:
+            if pieces.total(*key) % n:
+                self.message_update(f"Não dá para repartir igualmente em {n}.")
+                return False
+
+        moves = []
+        for (side, ptype, sign), bucket in buckets.items():
+            share = pieces.total(side, ptype, sign) // n
+            sub, need = 0, share
+            for p in bucket:
+                while p.count > need:
+                    moves.append((self.split_piece(p, need), side, sub))
+                    sub, need = sub + 1, share
+                moves.append((p, side, sub))
+                need -= p.count
+                if need == 0 and sub < n - 1:
+                    sub, need = sub + 1, share
+        pieces.move_many(moves)
+        self._full_layout = True
+        self.pack_pieces()
+        self.message_update(f"Peças repartidas em {n}.")
+        self.collapse_division()
+        return True
+
+    def split_piece(self, piece, units=1):
+        """
+        Separa `units` unidades de uma pilha numa peça nova, no mesmo lugar.
+        Exige 1 <= units < piece.count (ValueError fora disso).
+        """
+        if not 1 <= units < piece.count:
+            raise ValueError(f"não dá para separar {units} de uma pilha de {piece.count}")
+        self.pieces.set_count(piece, piece.count - units)
+        r = piece.rect
+        return self.add_piece(piece.type, piece.sign, piece.side, x=r.x, y=r.y,
+                              sub=piece.sub, count=units)
+
+    def drag_piece_to(self, piece, x, y):
+        """Posição livre (durante o arrasto), mantendo o índice espacial em dia."""
+        self.pieces.place(piece, int(x), int(y))
+
+    def piece_at(self, pos):
+        return self.pieces.piece_at(pos[0], pos[1])
+
+    def locate(self, x, y):
+        """Em qual (lado, subdivisão) cai o ponto (x, y) — O(1)."""
+        if x < LEFT_X + SIDE_W:
+            side = "left"
+        elif x > RIGHT_X:
+            side = "right"
+        else:
+            left_dist  = abs(x - (LEFT_X + SIDE_W // 2))
+            right_dist = abs(x - (RIGHT_X + SIDE_W // 2))
+            side = "left" if left_dist < right_dist else "right"
+
+        subs = max(1, self.divisoes_visuais)
+        sub = 0
+        if subs > 1 and (AREA_Y <= y <= AREA_Y + AREA_H):
+            step_h = AREA_H / subs
+            sub = int((y - AREA_Y) // step_h)
+            if sub < 0: sub = 0
+            if sub >= subs: sub = subs - 1
+        return side, sub
+
+    def load_layout(self, layout):
+        """Troca as peças pelas de um layout (ver equation_layout)."""
+        self.clear_pieces()
+        for ptype, sign, side, idx, count in layout:
+            self.add_piece(ptype, sign, side, idx, sub=0, count=count)
+
+    def generate_pieces_from_equation_values(self, aL, bL, aR, bR):
+        self.load_layout(equation_layout(aL, bL, aR, bR))
+
+    def compute_equation_from_pieces(self):
+        # O(1): lê os totais mantidos pelo PieceStore
+        pieces = self.pieces
+        return (pieces.net('left', 'x'), pieces.net('left', 'n'),
+                pieces.net('right', 'x'), pieces.net('right', 'n'))
+
+    def compute_polynomials(self):
+        """({tipo: coef} da esquerda, idem da direita) — só os termos não nulos."""
+        return self.pieces.polynomial('left'), self.pieces.polynomial('right')
+
+    def has_pending_pairs(self):
+        """Existe algum par + e - do mesmo tipo no mesmo lado/subdivisão?"""
+        sub_totals = self.pieces._sub_totals
+        for (side, sub, ptype, sign) in sub_totals:
+            if sign > 0 and (side, sub, ptype, -sign) in sub_totals:
+                return True
+        return False
+
+    def check_solved_and_return_solution(self):
+        # só equações lineares: sobrou x², y... => ainda não é "x = valor"
+        for side in ('left', 'right'):
+            if any(t != 'x' and t != 'n' for t in self.pieces._poly[side]):
+                return None
+        pieces = self.pieces
+        count_left_x = pieces.total('left', 'x', 1) + pieces.total('left', 'x', -1)
+        count_right_x = pieces.total('right', 'x', 1) + pieces.total('right', 'x', -1)
+        return solved_value(*self.compute_equation_from_pieces(), count_left_x, count_right_x)
+
+    # -----------------------------
+    # Empacotamento e posicionamento
+    # -----------------------------
+    def pack_pieces(self, full=False):
+        """
+        Empacota as peças dentro da área do lado esquerdo/direito.
+        Se houver divisões visuais (>1), cada subdivisão recebe sua própria grade.
+
+        Incremental: só os grupos (side, sub) que mudaram são refeitos, e só a
+        partir da primeira posição alterada. Depois de gerar peças ou mudar as
+        divisões (ou com full=True) todos os grupos são refeitos em lote.
+        """
+        pieces = self.pieces
+        subs = max(1, self.divisoes_visuais)
+        step_h = AREA_H / subs
+
+        if full or self._full_layout:
+            pieces.take_dirty()
+            order, xs, ys = _layout_bulk(pieces.groups(), step_h)
+            for p, x, y in zip(order, xs, ys):
+                pieces.place(p, x, y)
+            self._full_layout = False
+        else:
+            groups = pieces.groups()
+            for (side, s), start in pieces.take_dirty().items():
+                group = groups.get((side, s), ())
+                base_x = _base_x(side)
+                base_y = AREA_Y + 10 + s * step_h
+                for idx in range(start, len(group)):
+                    col = idx % LAYOUT_COLS
+                    row = idx // LAYOUT_COLS
+                    pieces.place(group[idx], int(base_x + col * LAYOUT_STEP),
+                                 int(base_y + row * LAYOUT_STEP))
+
+        if self.debug_checks:
+            pieces.check_totals()
+
+    # -----------------------------
+    # Anulação (encontra pares + e - do mesmo tipo, no mesmo lado e subdivisão)
+    # -----------------------------
+    def find_and_annihilate_pairs(self, pairing=None):
+        """
+        Uma única passada: agrupa as peças por (lado, subdivisão, tipo), pareia
+        sinais opostos em cada grupo, remove todas as peças pareadas de uma vez
+        e reempacota uma vez. Pilhas anulam por unidades (a que sobra só
+        diminui). Retorna o número de unidades anuladas de cada sinal.
+        """
+        pair_fn = _pair_nearest if (pairing or self.pairing) == "nearest" else _pair_in_order
+
+        buckets = {}
+        for p in self.pieces:
+            key = (p.side, p.sub, p.type)
+            bucket = buckets.get(key)
+            if bucket is None:
+                buckets[key] = [p]
+            else:
+                bucket.append(p)
+
+        removed = []
+        shrunk = []
+        bubbles = []
+        units = 0
+        for bucket in buckets.values():
+            if len(bucket) < 2:
+                continue
+            pairs, rest = pair_fn(bucket)
+            for p_a, p_b, k in pairs:
+                cx = (p_a.rect.centerx + p_b.rect.centerx) // 2
+                cy = (p_a.rect.centery + p_b.rect.centery) // 2
+                bubbles.append((cx, cy))
+                units += k
+            for p in bucket:
+                r = rest.get(p.id)
+                if r == 0:
+                    removed.append(p.id)
+                elif r is not None and r != p.count:
+                    shrunk.append((p, r))
+
+        if not bubbles:
+            return 0
+
+        for p, r in shrunk:
+            self.pieces.set_count(p, r)
+        self.pieces.remove_many(removed)
+        spawn = self.animations.spawn
+        for cx, cy in bubbles:
+            spawn(cx, cy)
+        self.pack_pieces()
+        self.message_update("Peças anuladas!")
+        return units
+
+    def generate_random_equation_and_pieces(self, constraints=None):
+        coefL, bL, coefR, bR, x0 = generate_equations(1, constraints, rng=self.rng)[0]
+        self.generate_pieces_from_equation_values(coefL, bL, coefR, bR)
+        self.message_update(f"Equação gerada com solução x = {x0}")
+
+    # -----------------------------
+    # Animações (apenas atualização de tempo)
+    # -----------------------------
+    def update_animations(self, dt):
+        self.animations.step(dt)
+
+    # -----------------------------
+    # Jogadas sem interface (lotes, correção automática)
+    # -----------------------------
+    def add_pair(self, ptype, sign):
+        """A mesma peça nos dois lados, como um clique na paleta. Retorna os ids."""
+        left = self.add_piece(ptype, sign, "left", self.pieces.side_count("left"))
+        right = self.add_piece(ptype, sign, "right", self.pieces.side_count("right"))
+        self.pack_pieces()
+        self.message_update("Peça adicionada em ambos os lados.")
+        return left.id, right.id
+
+    def drop_piece(self, piece, side, sub=0):
+        """
+        Solta a peça em (lado, subdivisão), como ao soltar o mouse: anula
+        pares e, se a divisão ficou exata, junta as subdivisões.
+        """
+        self.move_piece(piece, side, sub)
+        self.pack_pieces()
+        units = self.find_and_annihilate_pairs()
+        self.collapse_division()
+        return units
+
+    def _piece(self, pid):
+        if not _is_int(pid):
+            raise ValueError(f"id de peça inválido: {pid!r}")
+        piece = self.pieces.get(pid)
+        if piece is None:
+            raise ValueError(f"peça {pid} não existe")
+        return piece
+
+    def apply(self, move):
+        """
+        Aplica uma jogada (ver _apply) como uma ação do histórico.
+        ("undo",) e ("redo",) desfazem/refazem a última ação.
+        Jogada malformada levanta ValueError antes de mexer em qualquer coisa.
+        """
+        _check_move(move)
+        if move[0] == "undo":
+            return self.undo()
+        if move[0] == "redo":
+            return self.redo()
+        self.begin_action()
+        try:
+            return self._apply(move)
+        finally:
+            self.end_action()
+
+    def _apply(self, move):
+        """
+        Aplica uma jogada descrita por uma tupla:
+          ("new",) ou ("new", constraints)   sorteia uma equação
+          ("load", aL, bL, aR, bR)           monta a equação dada
+          ("add", tipo, sinal)               -> (id esquerdo, id direito)
+          ("move", id, lado, sub)            -> unidades anuladas
+          ("split", id, unidades)            -> id da peça nova
+          ("divide", n)
+          ("distribute",)                    -> True se repartiu
+          ("clear",)
+          ("annihilate",)                    -> unidades anuladas
+        """
+        kind = move[0]
+        if kind == "move":
+            return self.drop_piece(self._piece(move[1]), move[2], move[3] if len(move) > 3 else 0)
+        if kind == "add":
+            return self.add_pair(move[1], move[2])
+        if kind == "split":
+            piece = self.split_piece(self._piece(move[1]), move[2] if len(move) > 2 else 1)
+            self.pack_pieces()
+            return piece.id
+        if kind == "divide":
+            self.set_divisoes(move[1])
+            self.pack_pieces()
+            return None
+        if kind == "annihilate":
+            return self.find_and_annihilate_pairs()
+        if kind == "distribute":
+            return self.distribute()
+        if kind == "new":
+            self.generate_random_equation_and_pieces(move[1] if len(move) > 1 else None)
+        elif kind == "load":
+            self.generate_pieces_from_equation_values(*move[1:5])
+        elif kind == "clear":
+            self.clear_pieces()
+            self.set_divisoes(0)
+        else:
+            raise ValueError(f"jogada desconhecida: {move!r}")
+        self.pack_pieces()
+        return None
+
+    # -----------------------------
+    # Desfazer / refazer (log de deltas)
+    # -----------------------------
+    # Cada ação do usuário vira um delta: as operações que o PieceStore
+    # anotou no journal durante a ação, mais divisões e next_id antes/depois.
+    # Desfazer/refazer custa o tamanho do delta, nunca uma cópia do tabuleiro.
+    def begin_action(self):
+        """Abre uma ação (se não houver uma aberta); o que mudar entra num delta só."""
+        if self._action is None and self.history.maxlen != 0:
+            self._action = (self.divisoes_visuais, self.next_id)
+            self.pieces.journal = []
+
+    def end_action(self):
+        """Fecha a ação aberta e guarda o delta, se algo mudou."""
+        if self._action is None:
+            return
+        ops = self.pieces.journal
+        self.pieces.journal = None
+        div0, next0 = self._action
+        self._action = None
+        if not ops and div0 == self.divisoes_visuais:
+            return
+        self.history.append((tuple(ops), div0, self.divisoes_visuais, next0, self.next_id))
+        self.redo_log.clear()
+
+    def clear_history(self):
+        self.history.clear()
+        self.redo_log.clear()
+
+    def _replay_ops(self, ops, undo):
+        pieces = self.pieces
+        moves = []      # moves seguidos vão juntos (move_many): distribuir é O(n)
+        for op in (reversed(ops) if undo else ops):
+            kind = op[0]
+            if kind == "move":
+                _, pid, side, sub, new_side, new_sub = op
+                if undo:
+                    moves.append((pieces.get(pid), side, sub))
+                else:
+                    moves.append((pieces.get(pid), new_side, new_sub))
+                continue
+            if moves:
+                pieces.move_many(moves)
+                moves = []
+            if kind == "count":
+                pieces.set_count(pieces.get(op[1]), op[2] if undo else op[3])
+            elif (kind == "add") == undo:
+                # desfazer um add / refazer um remove
+                pieces.remove(op[1][0])
+            else:
+                pid, ptype, sign, side, sub, count = op[1]
+                rect = Rect(_base_x(side), AREA_Y, PIECE_SIZE, PIECE_SIZE)
+                pieces.add(Piece(pid, ptype, sign, side, sub, rect, count))
+        if moves:
+            pieces.move_many(moves)
+
+    def _restore(self, delta, undo):
+        ops, div0, div1, next0, next1 = delta
+        if div0 != div1:
+            self.divisoes_visuais = div0 if undo else div1
+            self._full_layout = True
+        self._replay_ops(ops, undo)
+        self.next_id = next0 if undo else next1
+        self.pack_pieces()
+
+    def undo(self):
+        """Desfaz a última ação. False se não há o que desfazer (ou há ação aberta)."""
+        if self._action is not None or not self.history:
+            return False
+        delta = self.history.pop()
+        self._restore(delta, undo=True)
+        self.redo_log.append(delta)
+        self.message_update("Desfeito.")
+        return True
+
+    def redo(self):
+        if self._action is not None or not self.redo_log:
+            return False
+        delta = self.redo_log.pop()
+        self._restore(delta, undo=False)
+        self.history.append(delta)
+        self.message_update("Refeito.")
+        return True
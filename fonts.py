@@ -0,0 +1,98 @@
+# fonts.py
+# Fontes resolvidas sob demanda, com cache em disco do caminho encontrado.
+#
+# pygame.font.SysFont varre os diretórios de fontes do sistema (fc-list no
+# Linux) a cada execução, o que pode levar centenas de ms. Aqui a varredura
+# acontece uma vez: o caminho do arquivo (e se o negrito é de verdade ou
+# simulado) fica em FONT_CACHE_FILE, e nas próximas aberturas a fonte é
+# carregada direto do arquivo. O resultado é o mesmo do SysFont.
+
+import json
+import os
+import time
+
+import pygame
+
+FONT_CACHE_FILE = os.path.join(
+    os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"),
+    "jogo_algebra", "fonts.json")
+
+# (rótulo, segundos, "cache" ou "varredura") de cada fonte resolvida
+resolve_log = []
+
+_cache = None
+
+
+def _load_cache():
+    global _cache
+    if _cache is None:
+        try:
+            with open(FONT_CACHE_FILE, encoding="utf-8") as f:
+                _cache = json.load(f)
+        except (OSError, ValueError):
+            _cache = {}
+    return _cache
+
+
+def _save_cache():
+    try:
+        os.makedirs(os.path.dirname(FONT_CACHE_FILE), exist_ok=True)
+        tmp = FONT_CACHE_FILE + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(_cache, f)
+        os.replace(tmp, FONT_CACHE_FILE)
+    except OSError:
+        pass    # sem cache em disco: só perde a aceleração
+
+
+def resolve(name, bold=False):
+    """
+    (caminho do arquivo ou None, negrito simulado?) como o SysFont faria.
+    None é a fonte padrão do pygame. Só fontes encontradas vão para o
+    cache: uma fonte instalada depois ainda é achada na próxima abertura.
+    """
+    key = f"{name.lower()}|{int(bold)}"
+    cache = _load_cache()
+    entry = cache.get(key)
+    if entry is not None and entry[0] is not None and os.path.exists(entry[0]):
+        return entry[0], entry[1], "cache"
+
+    path = pygame.font.match_font(name, bold=bold)
+    fake_bold = bold
+    if bold and path is not None:
+        # arquivo próprio de negrito só se for diferente do regular
+        fake_bold = path == pygame.font.match_font(name)
+    if path is not None:
+        cache[key] = [path, fake_bold]
+        _save_cache()
+    return path, fake_bold, "varredura"
+
+
+def load_font(name, size, bold=False):
+    t0 = time.perf_counter()
+    path, fake_bold, source = resolve(name, bold)
+    font = pygame.font.Font(path, size)
+    if fake_bold:
+        font.set_bold(True)
+    resolve_log.append((f"fonte {name} {size}{' negrito' if bold else ''}",
+                        time.perf_counter() - t0, source))
+    return font
+
+
+class LazyFont:
+    """Fonte carregada no primeiro uso; fora isso se comporta como pygame.font.Font."""
+
+    def __init__(self, name, size, bold=False):
+        # atributos com _ para não esconder métodos da Font (size, bold...)
+        self._name = name
+        self._size = size
+        self._bold = bold
+        self._font = None
+
+    def resolve(self):
+        if self._font is None:
+            self._font = load_font(self._name, self._size, self._bold)
+        return self._font
+
+    def __getattr__(self, attr):
+        return getattr(self.resolve(), attr)
@@ -3,91 +3,238 @@
 # Importa estado e funções de backend.py
 
 import sys
+import time
+
+# marcas do tempo de abertura (main.py --startup-profile)
+startup_marks = [("início do frontend", time.perf_counter())]
+
+
+def mark_startup(label):
+    startup_marks.append((label, time.perf_counter()))
+
+
+from functools import lru_cache
 import pygame
 from pygame import gfxdraw
 import backend
+mark_startup("pygame e backend importados")
 
-# Inicialização pygame (frontend controla display/font)
-pygame.init()
+# Inicialização pygame: só vídeo e fonte (o jogo não usa áudio, joystick...).
+# A janela abre antes de qualquer outro trabalho.
+pygame.display.init()
+pygame.font.init()
 pygame.display.set_caption("Simulador de bloco de álgebra")
 
 # tela e fontes (mantive como no seu original)
 WIDTH, HEIGHT = backend.WIDTH, backend.HEIGHT
 SCREEN = pygame.display.set_mode((WIDTH, HEIGHT))
 FPS = backend.FPS
+mark_startup("janela aberta")
+
+import solver
+from fonts import LazyFont
+from profiler import FrameProfiler, PHASES
 
-FONT = pygame.font.SysFont("Arial", 20)
-BIGFONT = pygame.font.SysFont("Arial", 30, bold=True)
+# Arial como antes, mas resolvida no primeiro uso e com cache do caminho
+FONT = LazyFont("Arial", 20)
+BIGFONT = LazyFont("Arial", 30, bold=True)
+
+# ---------- Agendador de frames ----------
+IDLE_TIMEOUT_MS = 1000    # parado, acorda no máximo uma vez por segundo
+MAX_DT = 0.1              # um frame longo não pula a animação inteira
+
+
+def coalesce_motion(events):
+    """Mantém só o último MOUSEMOTION de cada sequência de movimentos seguidos."""
+    out = []
+    for event in events:
+        if event.type == pygame.MOUSEMOTION and out and out[-1].type == pygame.MOUSEMOTION:
+            out[-1] = event
+        else:
+            out.append(event)
+    return out
+
+
+class FrameScheduler:
+    """
+    Entrega os eventos de cada frame. Com algo em movimento (arrasto,
+    animação) roda a FPS; com a cena parada bloqueia em pygame.event.wait
+    até chegar um evento (ou IDLE_TIMEOUT_MS), sem gastar CPU.
+    Rajadas de MOUSEMOTION viram uma única atualização por frame.
+    """
+
+    def __init__(self, fps=FPS, idle_timeout_ms=IDLE_TIMEOUT_MS):
+        self.clock = pygame.time.Clock()
+        self.fps = fps
+        self.idle_timeout_ms = idle_timeout_ms
+
+    def next_events(self, active):
+        """(eventos, dt em segundos) do próximo frame."""
+        if active:
+            dt = self.clock.tick(self.fps)
+            events = pygame.event.get()
+        else:
+            first = pygame.event.wait(self.idle_timeout_ms)
+            events = pygame.event.get()
+            if first.type != pygame.NOEVENT:
+                events.insert(0, first)
+            dt = self.clock.tick()
+        return coalesce_motion(events), min(dt / 1000.0, MAX_DT)
 
-clock = pygame.time.Clock()
+
+scheduler = FrameScheduler()
+
+# ---------- Cache de textos renderizados (LRU) ----------
+TEXT_CACHE_SIZE = 256
+
+@lru_cache(maxsize=TEXT_CACHE_SIZE)
+def render_text(font, text, color):
+    """Superfície do texto, reaproveitada enquanto (fonte, texto, cor) se repetir."""
+    return font.render(text, True, color)
 
 # Botões (mesmos nomes do original)
 generate_btn = pygame.Rect(20, 20, 220, 32)
 clear_btn = pygame.Rect(250, 20, 120, 32)
 dividir_btn = pygame.Rect(380, 20, 120, 32)
+distribuir_btn = pygame.Rect(510, 20, 140, 32)
 
 # Usaremos backend.palette (já tem rects) — frontend só desenha
 
-# ---------- Desenho de peça (copiado do seu original) ----------
-def draw_piece(surface, piece, highlight=False):
-    r = piece["rect"]
-    ptype = piece["type"]
-    sign = piece["sign"]
-
-    # ---------- DEFINIÇÃO DE CORES ----------
-    if ptype == "x":
-        color_pos = (58, 120, 255)      # azul forte
-        color_neg = (201, 42, 42)       # vermelho escuro
-    else:
-        color_pos = (52, 199, 89)       # verde forte
-        color_neg = (255, 127, 0)       # laranja queimado
+# ---------- Cores das peças ----------
+def piece_color(ptype, sign):
+    # cores no registro de termos do engine (x azul/vermelho, 1 verde/laranja...)
+    return backend.TERMS[ptype].color(sign)
+
+
+# ---------- Cache de sprites ----------
+# Cada variante (tipo, sinal, realce, tamanho, unidades) é desenhada uma única vez,
+# já com sombra e faixa negativa, e reaproveitada em todos os frames.
+SPRITE_SHADOW = 3      # deslocamento da sombra da peça
+SPRITE_BAND = 10       # altura da faixa negativa acima da peça
+
+_sprite_cache = {}
+
+def piece_label(ptype, count):
+    return backend.TERMS[ptype].label(count)
+
 
-    color = color_pos if sign > 0 else color_neg
+def piece_sprite(ptype, sign, highlight, size, count=1):
+    key = (ptype, sign, highlight, size, count)
+    sprite = _sprite_cache.get(key)
+    if sprite is not None:
+        return sprite
+
+    w, h = size
+    sprite = pygame.Surface((w + SPRITE_SHADOW, h + SPRITE_SHADOW + SPRITE_BAND), pygame.SRCALPHA)
+    r = pygame.Rect(0, SPRITE_BAND, w, h)
 
     # ---------- SOMBRA SUAVE ----------
-    shadow_rect = pygame.Rect(r.x + 3, r.y + 3, r.w, r.h)
-    shadow_surf = pygame.Surface((shadow_rect.w, shadow_rect.h), pygame.SRCALPHA)
-    pygame.draw.rect(shadow_surf, (0, 0, 0, 70), (0, 0, shadow_rect.w, shadow_rect.h), border_radius=12)
-    surface.blit(shadow_surf, (shadow_rect.x, shadow_rect.y))
+    pygame.draw.rect(sprite, (0, 0, 0, 70), r.move(SPRITE_SHADOW, SPRITE_SHADOW), border_radius=12)
 
     # ---------- PEÇA PRINCIPAL ----------
-    pygame.draw.rect(surface, color, r, border_radius=12)
+    pygame.draw.rect(sprite, piece_color(ptype, sign), r, border_radius=12)
 
     # ---------- BORDA DISCRETA ----------
-    pygame.draw.rect(surface, (20, 20, 20), r, 2, border_radius=12)
+    pygame.draw.rect(sprite, (20, 20, 20), r, 2, border_radius=12)
 
     # ---------- TEXTO ----------
-    txt = FONT.render("x" if ptype == "x" else "1", True, (255, 255, 255))
-    surface.blit(txt, txt.get_rect(center=r.center))
+    txt = FONT.render(piece_label(ptype, count), True, (255, 255, 255))
+    if txt.get_width() > w - 8:
+        # pilhas grandes ("50000x"): encolhe o texto para caber na peça
+        txt = pygame.transform.smoothscale(txt, (w - 8, max(1, txt.get_height() * (w - 8) // txt.get_width())))
+    sprite.blit(txt, txt.get_rect(center=r.center))
 
     # ---------- FAIXA NEGATIVA (somente se sign < 0) ----------
     if sign < 0:
-        neg_band = pygame.Rect(r.x, r.y - 10, r.w, 10)
-        pygame.draw.rect(surface, (30, 30, 30), neg_band, border_radius=4)
+        neg_band = pygame.Rect(0, 0, w, SPRITE_BAND)
+        pygame.draw.rect(sprite, (30, 30, 30), neg_band, border_radius=4)
         minus = FONT.render("-", True, (255, 255, 255))
-        surface.blit(minus, (neg_band.centerx - minus.get_width() // 2,
-                             neg_band.y + 1))
+        sprite.blit(minus, (neg_band.centerx - minus.get_width() // 2,
+                            neg_band.y + 1))
+
+    # ---------- PILHA: borda dupla ----------
+    if count > 1:
+        pygame.draw.rect(sprite, (255, 255, 255), r.inflate(-8, -8), 2, border_radius=8)
 
     # ---------- REALCE QUANDO ARRASTA ----------
-    if highlight or piece.get("dragging", False):
-        pygame.draw.rect(surface, (255, 240, 150), r, 4, border_radius=12)
+    if highlight:
+        pygame.draw.rect(sprite, (255, 240, 150), r, 4, border_radius=12)
 
+    sprite = sprite.convert_alpha()
+    _sprite_cache[key] = sprite
+    return sprite
 
-# ---------- Desenha bolha de anulação (visual) ----------
-def draw_annihilation(anim):
-    t = anim["t"]
-    dur = anim["dur"]
-    frac = min(1.0, t / dur) if dur > 0 else 1.0
 
-    r = int(24 * (1.0 - frac) + 2)
-    alpha = int(200 * (1.0 - frac))
+def piece_blit(piece, highlight=False):
+    """(sprite, posição) da peça — pronto para surface.blits()."""
+    r = piece.rect
+    sprite = piece_sprite(piece.type, piece.sign, highlight or piece.dragging, (r.w, r.h), piece.count)
+    return sprite, (r.x, r.y - SPRITE_BAND)
 
-    if alpha <= 0:
-        return
 
-    surf = pygame.Surface((r * 2 + 4, r * 2 + 4), pygame.SRCALPHA)
-    pygame.draw.circle(surf, (255, 200, 60, alpha), (r + 2, r + 2), r)
-    SCREEN.blit(surf, (anim["pos"][0] - r - 2, anim["pos"][1] - r - 2))
+def palette_sprite(label, ptype, sign, size):
+    key = ("palette", label, ptype, sign, size)
+    sprite = _sprite_cache.get(key)
+    if sprite is not None:
+        return sprite
+
+    w, h = size
+    sprite = pygame.Surface((w, h), pygame.SRCALPHA)
+    r = pygame.Rect(0, 0, w, h)
+
+    pygame.draw.rect(sprite, (0, 0, 0, 80), r.move(4, 4), border_radius=14)
+    pygame.draw.rect(sprite, piece_color(ptype, sign), r, border_radius=14)
+    pygame.draw.rect(sprite, (20, 20, 20), r, 3, border_radius=14)
+
+    lab = BIGFONT.render(label, True, (255, 255, 255))
+    sprite.blit(lab, (
+        r.w//2 - lab.get_width()//2,
+        r.h//2 - lab.get_height()//2
+    ))
+
+    sprite = sprite.convert_alpha()
+    _sprite_cache[key] = sprite
+    return sprite
+
+
+# ---------- Desenho de peça ----------
+def draw_piece(surface, piece, highlight=False):
+    surface.blit(*piece_blit(piece, highlight))
+
+
+# ---------- Bolhas de anulação (faixa de sprites) ----------
+# Cada quadro da bolha (raio e alfa caindo com o tempo) é desenhado uma vez;
+# o frame escolhe o quadro pela fração do tempo de vida.
+BUBBLE_FRAMES = 32
+
+_bubble_strip = None
+
+def bubble_strip():
+    global _bubble_strip
+    if _bubble_strip is None:
+        strip = []
+        for i in range(BUBBLE_FRAMES):
+            frac = i / BUBBLE_FRAMES
+            r = int(24 * (1.0 - frac) + 2)
+            alpha = int(200 * (1.0 - frac))
+            surf = pygame.Surface((r * 2 + 4, r * 2 + 4), pygame.SRCALPHA)
+            if alpha > 0:
+                pygame.draw.circle(surf, (255, 200, 60, alpha), (r + 2, r + 2), r)
+            strip.append((surf.convert_alpha(), r + 2))
+        _bubble_strip = strip
+    return _bubble_strip
+
+
+def bubble_blits():
+    """[(sprite, posição)] de todas as bolhas vivas — pronto para blits()."""
+    strip = bubble_strip()
+    xs, ys, fracs = backend.animations.snapshot()
+    last = BUBBLE_FRAMES - 1
+    blits = []
+    for x, y, frac in zip(xs, ys, fracs):
+        surf, half = strip[min(last, int(frac * BUBBLE_FRAMES))]
+        blits.append((surf, (int(x) - half, int(y) - half)))
+    return blits
 
 
 # ---------- Botões estilizados (copiados) ----------
@@ -103,7 +250,7 @@ def draw_button(surface, rect, text, color_idle, color_hover, text_color, mouse_
     pygame.draw.rect(surface, base_color, rect, border_radius=10)
     pygame.draw.rect(surface, (60, 60, 90), rect, 2, border_radius=10)
 
-    label = FONT.render(text, True, text_color)
+    label = render_text(FONT, text, text_color)
     surface.blit(label, (
         rect.x + rect.w//2 - label.get_width()//2,
         rect.y + rect.h//2 - label.get_height()//2))
@@ -120,9 +267,42 @@ def popup_divisor():
     ok_rect = pygame.Rect(x + 40, y + 130, 100, 40)
     cancel_rect = pygame.Rect(x + 180, y + 130, 100, 40)
 
-    active = True
-    while active:
-        for event in pygame.event.get():
+    dirty = True
+    while True:
+        # desenha antes de esperar (senão o popup só aparece no 1º evento)
+        # e depois só quando chegou algum evento
+        if dirty:
+            # desenhos do popup
+            shadow_rect = pygame.Rect(x - 4, y - 4, width + 8, height + 8)
+            pygame.draw.rect(SCREEN, (0, 0, 0, 120), shadow_rect, border_radius=10)
+            pygame.draw.rect(SCREEN, (240, 240, 240), (x, y, width, height), border_radius=12)
+            pygame.draw.rect(SCREEN, (180, 180, 180), (x, y, width, height), 3, border_radius=12)
+
+            title = render_text(BIGFONT, "Dividir por:", (20, 20, 20))
+            SCREEN.blit(title, (x + width // 2 - title.get_width() // 2, y + 20))
+
+            input_box = pygame.Rect(x + 40, y + 70, width - 80, 40)
+            pygame.draw.rect(SCREEN, (255, 255, 255), input_box, border_radius=8)
+            pygame.draw.rect(SCREEN, (120, 120, 120), input_box, 2, border_radius=8)
+
+            text_surf = render_text(BIGFONT, input_text, (0, 0, 0))
+            SCREEN.blit(text_surf, (input_box.x + 10, input_box.y + 6))
+
+            pygame.draw.rect(SCREEN, (120, 200, 120), ok_rect, border_radius=10)
+            ok_text = render_text(FONT, "OK", (0, 0, 0))
+            SCREEN.blit(ok_text, (ok_rect.centerx - ok_text.get_width() // 2,
+                                  ok_rect.centery - ok_text.get_height() // 2))
+
+            pygame.draw.rect(SCREEN, (220, 120, 120), cancel_rect, border_radius=10)
+            cancel_text = render_text(FONT, "Cancelar", (0, 0, 0))
+            SCREEN.blit(cancel_text, (cancel_rect.centerx - cancel_text.get_width() // 2,
+                                      cancel_rect.centery - cancel_text.get_height() // 2))
+
+            pygame.display.update()
+
+        events, _ = scheduler.next_events(active=False)
+        dirty = bool(events)
+        for event in events:
             if event.type == pygame.QUIT:
                 return None
 
@@ -135,7 +315,7 @@ def popup_divisor():
                     except:
                         return None
                 else:
-                    if event.unicode.isdigit():
+                    if event.unicode.isdigit() and len(input_text) < len(str(backend.MAX_DIVISOES)):
                         input_text += event.unicode
 
             if event.type == pygame.MOUSEBUTTONDOWN:
@@ -147,89 +327,46 @@ def popup_divisor():
                 if cancel_rect.collidepoint(event.pos):
                     return None
 
-        # desenhos do popup
-        shadow_rect = pygame.Rect(x - 4, y - 4, width + 8, height + 8)
-        pygame.draw.rect(SCREEN, (0, 0, 0, 120), shadow_rect, border_radius=10)
-        pygame.draw.rect(SCREEN, (240, 240, 240), (x, y, width, height), border_radius=12)
-        pygame.draw.rect(SCREEN, (180, 180, 180), (x, y, width, height), 3, border_radius=12)
-
-        title = BIGFONT.render("Dividir por:", True, (20, 20, 20))
-        SCREEN.blit(title, (x + width // 2 - title.get_width() // 2, y + 20))
 
-        input_box = pygame.Rect(x + 40, y + 70, width - 80, 40)
-        pygame.draw.rect(SCREEN, (255, 255, 255), input_box, border_radius=8)
-        pygame.draw.rect(SCREEN, (120, 120, 120), input_box, 2, border_radius=8)
-
-        text_surf = BIGFONT.render(input_text, True, (0, 0, 0))
-        SCREEN.blit(text_surf, (input_box.x + 10, input_box.y + 6))
-
-        pygame.draw.rect(SCREEN, (120, 200, 120), ok_rect, border_radius=10)
-        ok_text = FONT.render("OK", True, (0, 0, 0))
-        SCREEN.blit(ok_text, (ok_rect.centerx - ok_text.get_width() // 2,
-                              ok_rect.centery - ok_text.get_height() // 2))
-
-        pygame.draw.rect(SCREEN, (220, 120, 120), cancel_rect, border_radius=10)
-        cancel_text = FONT.render("Cancelar", True, (0, 0, 0))
-        SCREEN.blit(cancel_text, (cancel_rect.centerx - cancel_text.get_width() // 2,
-                                  cancel_rect.centery - cancel_text.get_height() // 2))
-
-        pygame.display.update()
+# ---------- Desenha toda a UI (usa backend para estado) ----------
+def hovered_button(mouse_pos):
+    for i, rect in enumerate((generate_btn, clear_btn, dividir_btn, distribuir_btn)):
+        if rect.collidepoint(mouse_pos):
+            return i
+    return -1
 
 
-# ---------- Desenha toda a UI (usa backend para estado) ----------
-def draw_ui():
-    SCREEN.fill((245, 240, 255))
-    mx, my = pygame.mouse.get_pos()
+def draw_static(surface, mouse_pos):
+    """Partes que só mudam com divisoes_visuais ou com o botão sob o mouse."""
+    surface.fill((245, 240, 255))
 
-    title = BIGFONT.render("Simulador de bloco de álgebra", True, (50, 40, 70))
-    SCREEN.blit(title, (backend.MARGIN, 65))
+    title = render_text(BIGFONT, "Simulador de bloco de álgebra", (50, 40, 70))
+    surface.blit(title, (backend.MARGIN, 65))
 
     # botões
-    draw_button(SCREEN, generate_btn, "Nova Equação",
-                (180, 210, 255), (160, 190, 245), (20, 20, 40), (mx, my))
-    draw_button(SCREEN, clear_btn, "Limpar",
-                (255, 190, 190), (245, 160, 160), (40, 20, 20), (mx, my))
-    draw_button(SCREEN, dividir_btn, "Dividir",
-                (200, 240, 200), (180, 220, 180), (20, 40, 20), (mx, my))
+    draw_button(surface, generate_btn, "Nova Equação",
+                (180, 210, 255), (160, 190, 245), (20, 20, 40), mouse_pos)
+    draw_button(surface, clear_btn, "Limpar",
+                (255, 190, 190), (245, 160, 160), (40, 20, 20), mouse_pos)
+    draw_button(surface, dividir_btn, "Dividir",
+                (200, 240, 200), (180, 220, 180), (20, 40, 20), mouse_pos)
+    draw_button(surface, distribuir_btn, "Distribuir",
+                (255, 235, 180), (245, 220, 160), (40, 35, 20), mouse_pos)
 
     # paleta (backend.palette contém rects)
-    for p in backend.palette:
-        r = p["rect"]
-        if p["type"] == "x":
-            color_pos = (58, 120, 255)
-            color_neg = (201, 42, 42)
-        else:
-            color_pos = (52, 199, 89)
-            color_neg = (255, 127, 0)
-        base_color = color_pos if p["sign"] > 0 else color_neg
-
-        shadow = pygame.Surface((r.w, r.h), pygame.SRCALPHA)
-        pygame.draw.rect(shadow, (0, 0, 0, 80), (4, 4, r.w, r.h), border_radius=14)
-        SCREEN.blit(shadow, (r.x, r.y))
-
-        pygame.draw.rect(SCREEN, base_color, r, border_radius=14)
-        pygame.draw.rect(SCREEN, (20, 20, 20), r, 3, border_radius=14)
-
-        lab = BIGFONT.render(p["label"], True, (255, 255, 255))
-        SCREEN.blit(lab, (
-            r.x + r.w//2 - lab.get_width()//2,
-            r.y + r.h//2 - lab.get_height()//2
-        ))
-
-    # mensagem
-    msg = FONT.render(backend.message, True, (50, 40, 70))
-    SCREEN.blit(msg, (backend.MARGIN, 150))
+    surface.blits([(palette_sprite(p["label"], p["type"], p["sign"], p["rect"].size), p["rect"].topleft)
+                   for p in backend.palette], False)
 
     # áreas esquerda e direita
     for area_x in (backend.LEFT_X, backend.RIGHT_X):
         shadow = pygame.Surface((backend.SIDE_W, backend.AREA_H), pygame.SRCALPHA)
         pygame.draw.rect(shadow, (0, 0, 0, 80), (6, 6, backend.SIDE_W, backend.AREA_H), border_radius=12)
-        SCREEN.blit(shadow, (area_x, backend.AREA_Y))
+        surface.blit(shadow, (area_x, backend.AREA_Y))
 
-        pygame.draw.rect(SCREEN, (250, 245, 255),
+        pygame.draw.rect(surface, (250, 245, 255),
                          pygame.Rect(area_x, backend.AREA_Y, backend.SIDE_W, backend.AREA_H),
                          border_radius=12)
-        pygame.draw.rect(SCREEN, (150, 140, 180),
+        pygame.draw.rect(surface, (150, 140, 180),
                          pygame.Rect(area_x, backend.AREA_Y, backend.SIDE_W, backend.AREA_H),
                          2, border_radius=12)
 
@@ -239,157 +376,499 @@ def draw_ui():
         step_h = backend.AREA_H / subs
         for i in range(1, subs):
             y = backend.AREA_Y + step_h * i
-            pygame.draw.line(SCREEN, (120, 120, 160), (backend.LEFT_X + 20, y), (backend.LEFT_X + backend.SIDE_W - 20, y), 2)
-            pygame.draw.line(SCREEN, (120, 120, 160), (backend.RIGHT_X + 20, y), (backend.RIGHT_X + backend.SIDE_W - 20, y), 2)
+            pygame.draw.line(surface, (120, 120, 160), (backend.LEFT_X + 20, y), (backend.LEFT_X + backend.SIDE_W - 20, y), 2)
+            pygame.draw.line(surface, (120, 120, 160), (backend.RIGHT_X + 20, y), (backend.RIGHT_X + backend.SIDE_W - 20, y), 2)
 
     # barra do '='
     eq_x = backend.LEFT_X + backend.SIDE_W + backend.MARGIN // 2
-    pygame.draw.line(SCREEN, (80, 80, 120),
+    pygame.draw.line(surface, (80, 80, 120),
                      (eq_x, backend.AREA_Y + 20),
                      (eq_x, backend.AREA_Y + backend.AREA_H - 20), 3)
 
-   
+
+def equation_text():
+    left, right = backend.compute_polynomials()
+    return f"{backend.format_polynomial(left)} = {backend.format_polynomial(right)}"
+
+
+INSTRUCTION = "Use a paleta para criar peças. Somente somando com o oposto anula."
+
+# ---------- Camada estática em cache ----------
+# Fundo, título, botões, paleta, áreas, divisões e a barra do '=' são compostos
+# uma vez numa superfície, refeita só quando muda divisoes_visuais ou o botão
+# sob o mouse.
+_background = None
+_background_key = None
+
+
+def get_background(mouse_pos):
+    global _background, _background_key
+    key = (max(1, backend.divisoes_visuais), hovered_button(mouse_pos))
+    if _background is None or key != _background_key:
+        if _background is None:
+            _background = pygame.Surface((WIDTH, HEIGHT)).convert()
+        draw_static(_background, mouse_pos)
+        _background_key = key
+    return _background
+
+
+def draw_ui():
+    SCREEN.blit(get_background(pygame.mouse.get_pos()), (0, 0))
+
+    # mensagem
+    SCREEN.blit(render_text(FONT, backend.message, (50, 40, 70)), (backend.MARGIN, 150))
 
     # equação
-    aL, bL, aR, bR = backend.compute_equation_from_pieces()
-    eq_full = BIGFONT.render(f"{backend.format_side(aL, bL)} = {backend.format_side(aR, bR)}", True, (80, 70, 100))
-    SCREEN.blit(eq_full, (backend.MARGIN, backend.AREA_Y - 65))
+    SCREEN.blit(render_text(BIGFONT, equation_text(), (80, 70, 100)), (backend.MARGIN, backend.AREA_Y - 65))
 
     # peças (estado do backend)
-    for p in backend.pieces:
-        draw_piece(SCREEN, p)
+    SCREEN.blits([piece_blit(p) for p in backend.pieces], False)
 
     # animações
-    for anim in backend.animations:
-        draw_annihilation(anim)
-
-    inst = FONT.render("Use a paleta para criar peças. Somente somando com o oposto anula.", True, (60, 50, 70))
-    SCREEN.blit(inst, (backend.MARGIN, backend.HEIGHT - 45))
+    SCREEN.blits(bubble_blits(), False)
+
+    SCREEN.blit(render_text(FONT, INSTRUCTION, (60, 50, 70)), (backend.MARGIN, backend.HEIGHT - 45))
+
+
+# ---------- Renderização por retângulos sujos ----------
+# Redesenha só as regiões que mudaram (peças movidas, peça arrastada, mensagem,
+# equação, bolhas) sobre a camada estática, e envia só essas regiões
+# com pygame.display.update(rects).
+DIRTY_RENDERING = True
+DIRTY_FULL_RATIO = 0.5   # acima desta fração da tela, redesenha tudo
+
+_last_frame = None       # o que foi desenhado no último frame
+
+
+def invalidate_screen():
+    """Força um redesenho completo no próximo frame (ex.: depois de um popup)."""
+    global _last_frame
+    _last_frame = None
+
+
+def _merge_rects(rects):
+    merged = []
+    for r in rects:
+        r = r.copy()
+        i = r.collidelist(merged)
+        while i != -1:
+            r.union_ip(merged.pop(i))
+            i = r.collidelist(merged)
+        merged.append(r)
+    return merged
+
+
+def draw_ui_dirty():
+    """Desenha o frame e retorna a lista de retângulos alterados."""
+    global _last_frame
+    screen_rect = SCREEN.get_rect()
+    background = get_background(pygame.mouse.get_pos())
+
+    msg_text = backend.message
+    eq_text = equation_text()
+    msg = render_text(FONT, msg_text, (50, 40, 70))
+    eq_full = render_text(BIGFONT, eq_text, (80, 70, 100))
+    texts = [(msg, (backend.MARGIN, 150)),
+             (eq_full, (backend.MARGIN, backend.AREA_Y - 65))]
+    inst = render_text(FONT, INSTRUCTION, (60, 50, 70))
+    inst_pos = (backend.MARGIN, backend.HEIGHT - 45)
+
+    piece_blits = [piece_blit(p) for p in backend.pieces]
+    piece_rects = [sprite.get_rect(topleft=pos) for sprite, pos in piece_blits]
+    placed = {p.id: blit for p, blit in zip(backend.pieces, piece_blits)}
+    bubbles = bubble_blits()
+    anim_rects = [sprite.get_rect(topleft=pos) for sprite, pos in bubbles]
+    text_rects = [surf.get_rect(topleft=pos) for surf, pos in texts]
+
+    frame = {
+        "background": _background_key,
+        "texts": (msg_text, eq_text),
+        "text_rects": text_rects,
+        "placed": placed,
+        "piece_rects": {pid: r for pid, r in zip(placed, piece_rects)},
+        "anim_rects": anim_rects,
+    }
+    prev = _last_frame
+    _last_frame = frame
+
+    if prev is None or prev["background"] != frame["background"]:
+        dirty = [screen_rect]
+    else:
+        dirty = []
+        for i, key in enumerate(frame["texts"]):
+            if key != prev["texts"][i]:
+                dirty.append(prev["text_rects"][i])
+                dirty.append(text_rects[i])
+
+        prev_placed = prev["placed"]
+        prev_rects = prev["piece_rects"]
+        for pid, blit in placed.items():
+            old = prev_placed.get(pid)
+            if old is None or old[0] is not blit[0] or old[1] != blit[1]:
+                dirty.append(frame["piece_rects"][pid])
+                if old is not None:
+                    dirty.append(prev_rects[pid])
+        for pid, r in prev_rects.items():
+            if pid not in placed:
+                dirty.append(r)
+
+        dirty.extend(prev["anim_rects"])
+        dirty.extend(anim_rects)
+
+        if not dirty:
+            return []
+        dirty = [r.clip(screen_rect) for r in _merge_rects(dirty)]
+        if sum(r.w * r.h for r in dirty) > DIRTY_FULL_RATIO * screen_rect.w * screen_rect.h:
+            dirty = [screen_rect]
+
+    for r in dirty:
+        SCREEN.set_clip(r)
+        SCREEN.blit(background, r, r)
+        for surf, pos in texts:
+            SCREEN.blit(surf, pos)
+        SCREEN.blits([piece_blits[i] for i in r.collidelistall(piece_rects)], False)
+        SCREEN.blits([bubbles[i] for i in r.collidelistall(anim_rects)], False)
+        SCREEN.blit(inst, inst_pos)
+    SCREEN.set_clip(None)
+    return dirty
+
+
+# ---------- Overlay de perfil (tecla P; Shift+P salva CSV) ----------
+# Com o overlay desligado os ganchos de tempo custam só um teste de booleano.
+profiler = FrameProfiler()
+
+OVERLAY_REFRESH = 15     # frames entre recálculos dos percentis
+OVERLAY_POS = (WIDTH - 300, HEIGHT - 140)
+_overlay = None
+_overlay_frame = -OVERLAY_REFRESH
+
+
+def profile_overlay():
+    """Painel opaco com p50/p95/p99 (ms) de cada fase, refeito a cada OVERLAY_REFRESH frames."""
+    global _overlay, _overlay_frame
+    if _overlay is not None and profiler.count - _overlay_frame < OVERLAY_REFRESH:
+        return _overlay
+    stats = profiler.stats()
+    rows = [("fase (ms)", "p50", "p95", "p99")]
+    for name in PHASES + ("total",):
+        rows.append((name,) + tuple(f"{v * 1000.0:.2f}" for v in stats[name]))
+    line_h = FONT.get_linesize()
+    panel = pygame.Surface((290, 10 + line_h * len(rows))).convert()
+    panel.fill((30, 30, 40))
+    for i, row in enumerate(rows):
+        y = 5 + i * line_h
+        panel.blit(FONT.render(row[0], True, (220, 220, 160)), (8, y))
+        for j, cell in enumerate(row[1:]):
+            surf = FONT.render(cell, True, (220, 220, 160))
+            panel.blit(surf, (150 + j * 65 - surf.get_width(), y))
+    _overlay, _overlay_frame = panel, profiler.count
+    return panel
+
+
+def draw_profile_overlay():
+    """Desenha o overlay por cima do frame e retorna o retângulo ocupado."""
+    return SCREEN.blit(profile_overlay(), OVERLAY_POS)
 
 
 # ---------- Loop principal (frontend controla eventos e chama backend) ----------
-def mainloop():
-    global SCREEN
+dragging_piece = None   # peça presa no mouse (ou None)
+
+
+def settle(annihilate=False):
+    """
+    Reempacota (e anula pares, ao soltar); o tempo vai para a fase "pack".
+    Retorna as unidades anuladas.
+    """
+    if profiler.enabled:
+        t0 = time.perf_counter()
+    backend.pack_pieces()
+    units = backend.find_and_annihilate_pairs() if annihilate else 0
+    if profiler.enabled:
+        profiler.add_pack(time.perf_counter() - t0)
+    return units
+
+
+# ---------- Telemetria (main.py --telemetry) ----------
+telemetry = None        # TelemetrySink ou None (desligada: emit só testa isto)
+_was_solved = False
+
+
+def emit(kind, fields=None):
+    if telemetry is not None:
+        telemetry.emit(kind, fields)
+
+
+def report_solved():
+    """Registra "solved" quando uma ação deixa o tabuleiro resolvido."""
+    global _was_solved
+    x = backend.check_solved_and_return_solution()
+    if x is not None and not _was_solved:
+        emit("solved", {"x": x, "equation": equation_text()})
+    _was_solved = x is not None
+
+
+def distribute():
+    """Botão Distribuir / tecla D (o reempacotamento entra na fase "pack")."""
+    n = backend.divisoes_visuais
+    if profiler.enabled:
+        t0 = time.perf_counter()
+    done = backend.distribute()
+    if profiler.enabled:
+        profiler.add_pack(time.perf_counter() - t0)
+    if done:
+        emit("distribute", {"n": n})
+
+
+EXPOSE_EVENTS = (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED, pygame.WINDOWRESTORED)
+
+
+def handle_event(event):
+    """
+    Aplica um evento do pygame ao jogo. False quando é para sair.
+    Cada clique/tecla é uma ação do histórico; um arrasto (do botão
+    pressionado até soltar, com as anulações) é uma ação só.
+    Ctrl+Z desfaz; Ctrl+Y ou Ctrl+Shift+Z refaz.
+    """
+    if event.type == pygame.KEYDOWN and event.mod & pygame.KMOD_CTRL and event.key in (pygame.K_z, pygame.K_y):
+        if dragging_piece is None:
+            redo = event.key == pygame.K_y or event.mod & pygame.KMOD_SHIFT
+            if backend.redo() if redo else backend.undo():
+                emit("redo" if redo else "undo")
+            else:
+                backend.message_update("Nada para refazer." if redo else "Nada para desfazer.")
+        return True
+    if event.type in EXPOSE_EVENTS:
+        # a janela voltou a aparecer: o próximo frame redesenha tudo
+        invalidate_screen()
+        return True
+    if event.type not in (pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP, pygame.KEYDOWN):
+        return _handle_event(event)
+    backend.begin_action()
+    try:
+        return _handle_event(event)
+    finally:
+        if dragging_piece is None:
+            backend.end_action()
+            if telemetry is not None:
+                report_solved()
+
+
+def _handle_event(event):
+    global dragging_piece
+
+    if event.type == pygame.QUIT:
+        return False
+
+    # MOUSE DOWN
+    elif event.type == pygame.MOUSEBUTTONDOWN:
+        # com uma peça presa no mouse, nenhum clique muda o tabuleiro
+        if dragging_piece is not None:
+            return True
+        if event.button == 1:
+            # Botão Nova Equação
+            if generate_btn.collidepoint(event.pos):
+                backend.generate_random_equation_and_pieces()
+                settle()
+                emit("new", {"equation": equation_text()})
+
+            # Botão Limpar
+            elif clear_btn.collidepoint(event.pos):
+                backend.clear_pieces()
+                backend.set_divisoes(0)
+                backend.message_update("Limpo.")
+                settle()
+                emit("clear")
+
+            # Botão DIVIDIR (a divisão se completa quando as subdivisões ficam iguais)
+            elif dividir_btn.collidepoint(event.pos):
+                divisor = popup_divisor()
+                invalidate_screen()
+                if divisor is not None and 1 <= divisor <= backend.MAX_DIVISOES:
+                    backend.set_divisoes(divisor)
+                    backend.message_update(f"Tela dividida em {backend.divisoes_visuais}. Agora arraste as peças.")
+                    settle()
+                    emit("divide", {"n": backend.divisoes_visuais})
+                else:
+                    backend.message_update(f"Divisão cancelada ou inválida (de 1 a {backend.MAX_DIVISOES}).")
+                return True
+
+            # Botão Distribuir: reparte tudo de uma vez entre as subdivisões
+            elif distribuir_btn.collidepoint(event.pos):
+                distribute()
+                return True
+
+            # Paleta
+            added_from_palette = False
+            for pbtn in backend.palette:
+                if pbtn["rect"].collidepoint(event.pos):
+                    left_count  = backend.pieces.side_count("left")
+                    right_count = backend.pieces.side_count("right")
+                    backend.add_piece(pbtn["type"], pbtn["sign"], "left", left_count, sub=0)
+                    backend.add_piece(pbtn["type"], pbtn["sign"], "right", right_count, sub=0)
+                    settle()
+                    backend.message_update("Peça adicionada em ambos os lados.")
+                    emit("add", {"type": pbtn["type"], "sign": pbtn["sign"]})
+                    added_from_palette = True
+                    break
+            if added_from_palette:
+                return True
+
+            # Início do arrasto de peça
+            p = backend.piece_at(event.pos)
+            if p is not None:
+                dragging_piece = p
+                p.dragging = True
+                ox = event.pos[0] - p.rect.x
+                oy = event.pos[1] - p.rect.y
+                p.offset = (ox, oy)
+
+        # Botão direito numa pilha: separa uma unidade e arrasta só ela
+        elif event.button == 3:
+            p = backend.piece_at(event.pos)
+            if p is not None:
+                if p.count > 1:
+                    p = backend.split_piece(p, 1)
+                dragging_piece = p
+                p.dragging = True
+                p.offset = (event.pos[0] - p.rect.x, event.pos[1] - p.rect.y)
+
+    # MOUSE UP
+    elif event.type == pygame.MOUSEBUTTONUP:
+        if event.button == 1 or (event.button == 3 and dragging_piece is not None):
+            if dragging_piece is None:
+                settle()
+                return True
+
+            # lado e subdivisão onde o centro da peça caiu
+            side, sub_index = backend.locate(*dragging_piece.rect.center)
+            if telemetry is not None:
+                p = dragging_piece
+                emit("drag", {"type": p.type, "sign": p.sign, "count": p.count,
+                              "from": [p.side, p.sub], "to": [side, sub_index]})
+
+            backend.move_piece(dragging_piece, side, sub_index)
+            dragging_piece.dragging = False
+            dragging_piece = None
+
+            units = settle(annihilate=True)
+            if units:
+                emit("annihilate", {"units": units})
+            n = backend.collapse_division()
+            if n:
+                emit("collapse", {"n": n})
+
+    # MOUSE MOVE
+    elif event.type == pygame.MOUSEMOTION:
+        if dragging_piece:
+            ox, oy = dragging_piece.offset
+            backend.drag_piece_to(dragging_piece, event.pos[0] - ox, event.pos[1] - oy)
+
+    # KEYBOARD
+    elif event.type == pygame.KEYDOWN:
+        if event.key == pygame.K_n and dragging_piece is None:
+            backend.generate_random_equation_and_pieces()
+            settle()
+            emit("new", {"equation": equation_text()})
+        elif event.key == pygame.K_p:
+            if event.mod & pygame.KMOD_SHIFT:
+                path = profiler.dump_csv(time.strftime("profile_%Y%m%d_%H%M%S.csv"))
+                backend.message_update(f"Perfil salvo em {path} ({len(profiler)} frames).")
+            else:
+                profiler.toggle()
+                invalidate_screen()
+        elif event.key == pygame.K_d and dragging_piece is None:
+            distribute()
+        elif event.key == pygame.K_h:
+            hint = solver.hint_for_session(backend.session)
+            if hint is None:
+                backend.message_update("Sem solução inteira a partir daqui.")
+            else:
+                moves, move = hint
+                backend.message_update(f"Dica: {solver.describe_move(move)} (faltam {moves} jogadas)")
+
+    return True
+
+
+def cancel_drag():
+    """Devolve a peça presa no mouse ao seu lugar no grupo (ex.: ao sair)."""
+    global dragging_piece
+    p = dragging_piece
+    if p is None:
+        return
     dragging_piece = None
+    p.dragging = False
+    backend.move_piece(p, p.side, p.sub)    # mesmo grupo: só marca para reposicionar
+    backend.pack_pieces()
+    backend.end_action()
+
+
+def run_frame(events, dt):
+    """Um frame: eventos, animações e desenho. False quando é para sair."""
+    profiling = profiler.enabled
+    if profiling:
+        t0 = time.perf_counter()
+
     running = True
+    for event in events:
+        if not handle_event(event):
+            running = False
+
+    if profiling:
+        t1 = time.perf_counter()
+    backend.update_animations(dt)
+    if profiling:
+        t2 = time.perf_counter()
+
+    if DIRTY_RENDERING:
+        rects = draw_ui_dirty()
+    else:
+        draw_ui()
+        rects = None
+
+    if profiling:
+        t3 = time.perf_counter()
+        profiler.record(t1 - t0, t2 - t1, t3 - t2)
+        if profiler.enabled:
+            overlay = draw_profile_overlay()
+            if rects is not None:
+                rects.append(overlay)
+
+    if rects is None:
+        pygame.display.flip()
+    else:
+        pygame.display.update(rects)
+    return running
+
 
+def new_game():
+    """Estado inicial do jogo: equação sorteada pela sessão atual."""
+    global dragging_piece
+    dragging_piece = None
     backend.generate_random_equation_and_pieces()
     backend.pack_pieces()
 
-    while running:
-        dt = clock.tick(FPS) / 1000.0
-        mx, my = pygame.mouse.get_pos()
 
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                running = False
-
-            # MOUSE DOWN
-            elif event.type == pygame.MOUSEBUTTONDOWN:
-                if event.button == 1:
-                    # Botão Nova Equação
-                    if generate_btn.collidepoint(event.pos):
-                        backend.generate_random_equation_and_pieces()
-                        backend.pack_pieces()
-
-                    # Botão Limpar
-                    elif clear_btn.collidepoint(event.pos):
-                        backend.clear_pieces()
-                        backend.divisoes_visuais = 0
-                        backend.message_update("Limpo.")
-                        backend.pack_pieces()
-
-                    # Botão DIVIDIR (SÓ visual)
-                    elif dividir_btn.collidepoint(event.pos):
-                        divisor = popup_divisor()
-                        if divisor is not None and divisor >= 1:
-                            backend.divisoes_visuais = int(divisor)
-                            backend.message_update(f"Tela dividida em {backend.divisoes_visuais}. Agora arraste as peças.")
-                            backend.pack_pieces()
-                        else:
-                            backend.message_update("Divisão cancelada ou inválida.")
-                        continue
-
-                    # Paleta
-                    added_from_palette = False
-                    for pbtn in backend.palette:
-                        if pbtn["rect"].collidepoint(event.pos):
-                            left_count  = sum(1 for p in backend.pieces if p["side"] == "left")
-                            right_count = sum(1 for p in backend.pieces if p["side"] == "right")
-                            backend.add_piece(pbtn["type"], pbtn["sign"], "left", left_count, sub=0)
-                            backend.add_piece(pbtn["type"], pbtn["sign"], "right", right_count, sub=0)
-                            backend.pack_pieces()
-                            backend.message_update("Peça adicionada em ambos os lados.")
-                            added_from_palette = True
-                            break
-                    if added_from_palette:
-                        continue
-
-                    # Início do arrasto de peça
-                    for p in reversed(backend.pieces):
-                        if p["rect"].collidepoint(event.pos):
-                            dragging_piece = p
-                            p["dragging"] = True
-                            ox = event.pos[0] - p["rect"].x
-                            oy = event.pos[1] - p["rect"].y
-                            p["offset"] = (ox, oy)
-                            break
-
-            # MOUSE UP
-            elif event.type == pygame.MOUSEBUTTONUP:
-                if event.button == 1:
-                    if dragging_piece is None:
-                        backend.pack_pieces()
-                        continue
-
-                    cx = dragging_piece["rect"].centerx
-                    cy = dragging_piece["rect"].centery
-
-                    if cx < backend.LEFT_X + backend.SIDE_W:
-                        dragging_piece["side"] = "left"
-                    elif cx > backend.RIGHT_X:
-                        dragging_piece["side"] = "right"
-                    else:
-                        left_dist  = abs(cx - (backend.LEFT_X + backend.SIDE_W // 2))
-                        right_dist = abs(cx - (backend.RIGHT_X + backend.SIDE_W // 2))
-                        dragging_piece["side"] = "left" if left_dist < right_dist else "right"
-
-                    # subdivisão
-                    subs = max(1, backend.divisoes_visuais)
-                    if subs > 1 and (backend.AREA_Y <= cy <= backend.AREA_Y + backend.AREA_H):
-                        step_h = backend.AREA_H / subs
-                        sub_index = int((cy - backend.AREA_Y) // step_h)
-                        if sub_index < 0: sub_index = 0
-                        if sub_index >= subs: sub_index = subs - 1
-                        dragging_piece["sub"] = sub_index
-                    else:
-                        dragging_piece["sub"] = 0
-
-                    dragging_piece["dragging"] = False
-                    dragging_piece = None
-
-                    backend.pack_pieces()
-
-                    while backend.find_and_annihilate_pairs():
-                        backend.pack_pieces()
-
-            # MOUSE MOVE
-            elif event.type == pygame.MOUSEMOTION:
-                if dragging_piece:
-                    ox, oy = dragging_piece["offset"]
-                    dragging_piece["rect"].x = event.pos[0] - ox
-                    dragging_piece["rect"].y = event.pos[1] - oy
-
-            # KEYBOARD
-            elif event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_n:
-                    backend.generate_random_equation_and_pieces()
-                    backend.pack_pieces()
-
-        backend.update_animations(dt)
+def first_frame(resume=False):
+    """Prepara o jogo e desenha o primeiro frame sem esperar eventos."""
+    global dragging_piece
+    if resume:
+        dragging_piece = None
+    else:
+        new_game()
+    run_frame([], 0.0)
+    mark_startup("primeiro frame")
 
-        draw_ui()
-        pygame.display.flip()
+
+def mainloop(resume=False):
+    """resume=True continua o tabuleiro já carregado na sessão (snapshot)."""
+    first_frame(resume)
+    running = True
+
+    while running:
+        # só roda a FPS enquanto algo se mexe
+        active = dragging_piece is not None or len(backend.animations) > 0
+        events, dt = scheduler.next_events(active)
+        running = run_frame(events, dt)
 
     pygame.quit()
     sys.exit()
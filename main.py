@@ -1,5 +1,101 @@
 # main.py - inicia o frontend
-from frontend import mainloop
+#   python main.py                       # joga (retoma a partida salva, se houver)
+#   python main.py --new                 # começa uma partida nova
+#   python main.py --record sessao.rec   # joga gravando a entrada (ver replay.py)
+#   python main.py --startup-profile     # mede a abertura até o primeiro frame e sai
+import time
+T0 = time.perf_counter()
+
+import argparse
+import os
+import sys
+
+SAVE_FILE = os.path.join(os.path.expanduser("~"), ".jogo_algebra.sav")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulador de bloco de álgebra")
+    parser.add_argument("--record", metavar="ARQUIVO", help="grava eventos e semente para replay")
+    parser.add_argument("--seed", type=int, help="semente do sorteio de equações")
+    parser.add_argument("--save", metavar="ARQUIVO", default=SAVE_FILE,
+                        help="onde a partida é salva ao sair e retomada ao abrir")
+    parser.add_argument("--new", action="store_true", help="ignora a partida salva")
+    parser.add_argument("--no-save", action="store_true", help="não salva ao sair")
+    parser.add_argument("--startup-profile", action="store_true",
+                        help="mostra o tempo de cada etapa da abertura e sai")
+    parser.add_argument("--telemetry", metavar="ARQUIVO",
+                        help="registra as ações do aluno (.jsonl, ou .sqlite/.db)")
+    parser.add_argument("--telemetry-flush", type=float, metavar="S",
+                        help="segundos entre gravações da telemetria")
+    parser.add_argument("--telemetry-batch", type=int, metavar="N",
+                        help="eventos por lote da telemetria")
+    args = parser.parse_args(argv)
+
+    import frontend     # abre a janela
+    import backend
+
+    if args.telemetry:
+        import telemetry
+        options = {}
+        if args.telemetry_flush is not None:
+            options["flush_interval"] = args.telemetry_flush
+        if args.telemetry_batch is not None:
+            options["batch_size"] = args.telemetry_batch
+        frontend.telemetry = telemetry.open_sink(args.telemetry, **options)
+    try:
+        run(args, frontend, backend)
+    finally:
+        if frontend.telemetry is not None:
+            frontend.telemetry.close()
+
+
+def run(args, frontend, backend):
+    if args.record:
+        # gravação começa sempre de uma partida nova com semente conhecida
+        import replay
+        recorder = replay.start_recording(frontend, backend, args.record, args.seed)
+        try:
+            frontend.mainloop()
+        finally:
+            recorder.close(backend.session)
+        return
+
+    import snapshot
+    if args.seed is not None:
+        backend.new_session(args.seed)
+    resume = False
+    if not args.new and args.seed is None and os.path.exists(args.save):
+        try:
+            snapshot.load(args.save, backend.session)
+            resume = True
+        except (OSError, snapshot.SnapshotError):
+            backend.new_session()
+    if args.startup_profile:
+        frontend.first_frame(resume)
+        print_startup_profile(frontend)
+        return
+    try:
+        frontend.mainloop(resume)
+    except SystemExit:
+        if not args.no_save:
+            # peça presa no mouse volta ao seu lugar antes de salvar
+            frontend.cancel_drag()
+            try:
+                snapshot.save(backend.session, args.save)
+            except (OSError, snapshot.SnapshotError) as e:
+                print(f"não foi possível salvar a partida em {args.save}: {e}", file=sys.stderr)
+        raise
+
+
+def print_startup_profile(frontend):
+    import fonts
+    print("abertura (ms desde o início do main.py):")
+    print(f"{0.0:9.1f}  início")
+    for label, t in frontend.startup_marks:
+        print(f"{(t - T0) * 1000:9.1f}  {label}")
+    for label, seconds, source in fonts.resolve_log:
+        print(f"{'':9}  {label}: {seconds * 1000:.1f} ms ({source})")
+
 
 if __name__ == "__main__":
-    mainloop()
+    main()
@@ -0,0 +1,91 @@
+# profiler.py
+# Tempo de cada frame dividido em fases, num buffer circular.
+# Python puro, sem pygame: serve ao overlay do frontend, ao bench e ao replay.
+#
+# Desligado (enabled = False) o frontend só testa um booleano por fase;
+# ligado, grava um registro por frame e calcula p50/p95/p99 sob demanda.
+
+import csv
+from array import array
+
+PHASES = ("events", "animations", "pack", "draw")
+PROFILE_FRAMES = 600          # ~10 s a 60 FPS
+PERCENTILES = (50, 95, 99)
+
+
+class FrameProfiler:
+    """
+    Buffer circular de tempos por fase (em segundos).
+    "events" é o tratamento de eventos sem o tempo de pack/anulação,
+    que vai para "pack" (acumulado com add_pack durante o frame).
+    """
+
+    def __init__(self, capacity=PROFILE_FRAMES):
+        self.enabled = False
+        self.capacity = capacity
+        self.columns = PHASES + ("total",)
+        self.data = {name: array('d', bytes(8 * capacity)) for name in self.columns}
+        self.count = 0        # frames gravados desde o começo
+        self._pack = 0.0
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def toggle(self):
+        self.enabled = not self.enabled
+        return self.enabled
+
+    def clear(self):
+        self.count = 0
+        self._pack = 0.0
+
+    def add_pack(self, seconds):
+        self._pack += seconds
+
+    def record(self, events, animations, draw):
+        """Fecha o frame. events inclui o pack; ele é descontado aqui."""
+        pack = self._pack
+        self._pack = 0.0
+        i = self.count % self.capacity
+        d = self.data
+        d["events"][i] = max(0.0, events - pack)
+        d["animations"][i] = animations
+        d["pack"][i] = pack
+        d["draw"][i] = draw
+        d["total"][i] = events + animations + draw
+        self.count += 1
+
+    def _order(self):
+        """Índices do buffer do frame mais antigo ao mais novo."""
+        n = len(self)
+        start = self.count - n
+        return [(start + k) % self.capacity for k in range(n)]
+
+    def values(self, name):
+        col = self.data[name]
+        return [col[i] for i in self._order()]
+
+    def percentiles(self, name, ps=PERCENTILES):
+        """Percentis (nearest-rank) de uma coluna, em segundos."""
+        n = len(self)
+        if n == 0:
+            return tuple(0.0 for _ in ps)
+        ordered = sorted(self.data[name][:n])
+        return tuple(ordered[min(n - 1, max(0, -(-p * n // 100) - 1))] for p in ps)
+
+    def stats(self, ps=PERCENTILES):
+        return {name: self.percentiles(name, ps) for name in self.columns}
+
+    def rows(self):
+        """(frame, events, animations, pack, draw, total) em ms, em ordem."""
+        first = self.count - len(self)
+        cols = [self.data[name] for name in self.columns]
+        for k, i in enumerate(self._order()):
+            yield (first + k,) + tuple(round(c[i] * 1000.0, 4) for c in cols)
+
+    def dump_csv(self, path):
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(("frame",) + tuple(f"{name}_ms" for name in self.columns))
+            writer.writerows(self.rows())
+        return path
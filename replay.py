@@ -0,0 +1,265 @@
+# replay.py
+# Gravação e reprodução determinística da entrada do jogo.
+#
+# Grava os eventos que o mainloop processa (frame a frame, com o instante e o
+# dt) e a semente da sessão num arquivo binário compacto. A reprodução roda
+# sem janela e sem o ritmo de FPS, e confere o estado final do tabuleiro.
+#
+#   python main.py --record sessao.rec       # joga gravando
+#   python replay.py sessao.rec              # reproduz sem janela
+#   python replay.py sessao.rec --no-draw    # só o backend
+#   python replay.py sessao.rec --profile perfil.csv
+#
+# Formato (little-endian):
+#   cabeçalho  MAGIC, versão (u16), semente (u64)
+#   frame      t_ms (u32), dt (f32), n (u16), seguido de n eventos
+#   evento     tipo, botão, x, y, tecla, mod, unicode  (16 bytes)
+#   fim        frame com n = END_MARK, seguido do digest do tabuleiro
+
+import os
+import sys
+import struct
+import hashlib
+import random
+import time
+
+import pygame
+
+MAGIC = b"JOGR"
+VERSION = 1
+HEADER = struct.Struct("<4sHQ")
+FRAME = struct.Struct("<IfH")
+EVENT = struct.Struct("<BBhhiHI")
+END_MARK = 0xFFFF
+DIGEST_SIZE = 16
+
+# tipos de evento gravados (os demais o jogo ignora)
+KINDS = (pygame.QUIT, pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP,
+         pygame.MOUSEMOTION, pygame.KEYDOWN)
+_KIND_CODE = {t: i for i, t in enumerate(KINDS)}
+
+
+class ReplayError(Exception):
+    pass
+
+
+def board_digest(session):
+    """Resumo do estado lógico do tabuleiro (independe de ids e posições)."""
+    pieces = sorted((p.type, p.sign, p.side, p.sub, p.count) for p in session.pieces)
+    text = repr((session.divisoes_visuais, session.compute_equation_from_pieces(), pieces))
+    return hashlib.blake2b(text.encode(), digest_size=DIGEST_SIZE).digest()
+
+
+# -----------------------------
+# Eventos <-> registros
+# -----------------------------
+def pack_event(event):
+    """Registro binário do evento, ou None se o tipo não é gravado."""
+    code = _KIND_CODE.get(event.type)
+    if code is None:
+        return None
+    button = x = y = key = mod = uni = 0
+    if event.type in (pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP):
+        button = event.button
+        x, y = event.pos
+    elif event.type == pygame.MOUSEMOTION:
+        x, y = event.pos
+        button = sum(1 << i for i, b in enumerate(event.buttons[:3]) if b)
+    elif event.type == pygame.KEYDOWN:
+        key, mod = event.key, event.mod & 0xFFFF
+        uni = ord(event.unicode) if len(event.unicode) == 1 else 0
+    return EVENT.pack(code, button, x, y, key, mod, uni)
+
+
+def unpack_event(data, offset=0):
+    code, button, x, y, key, mod, uni = EVENT.unpack_from(data, offset)
+    etype = KINDS[code]
+    if etype in (pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP):
+        return pygame.event.Event(etype, button=button, pos=(x, y))
+    if etype == pygame.MOUSEMOTION:
+        buttons = tuple((button >> i) & 1 for i in range(3))
+        return pygame.event.Event(etype, pos=(x, y), rel=(0, 0), buttons=buttons)
+    if etype == pygame.KEYDOWN:
+        return pygame.event.Event(etype, key=key, mod=mod, unicode=chr(uni) if uni else "")
+    return pygame.event.Event(etype)
+
+
+# -----------------------------
+# Gravação
+# -----------------------------
+class RecordingScheduler:
+    """
+    Envolve o agendador do frontend: repassa os eventos de cada frame e
+    grava-os no arquivo. Serve também ao loop do popup.
+    """
+
+    def __init__(self, inner, path, seed):
+        self.inner = inner
+        self.file = open(path, "wb")
+        self.file.write(HEADER.pack(MAGIC, VERSION, seed))
+        self.start = time.perf_counter()
+        self.frames = 0
+
+    def next_events(self, active):
+        events, dt = self.inner.next_events(active)
+        records = [r for r in map(pack_event, events) if r is not None]
+        t_ms = int((time.perf_counter() - self.start) * 1000.0)
+        self.file.write(FRAME.pack(t_ms, dt, len(records)))
+        self.file.write(b"".join(records))
+        self.frames += 1
+        return events, dt
+
+    def close(self, session=None):
+        if self.file.closed:
+            return
+        if session is not None:
+            t_ms = int((time.perf_counter() - self.start) * 1000.0)
+            self.file.write(FRAME.pack(t_ms, 0.0, END_MARK))
+            self.file.write(board_digest(session))
+        self.file.close()
+
+
+def start_recording(frontend, backend, path, seed=None):
+    """Nova sessão com semente conhecida e o agendador do frontend gravando."""
+    if seed is None:
+        seed = random.randrange(2 ** 63)
+    backend.new_session(seed)
+    recorder = RecordingScheduler(frontend.scheduler, path, seed)
+    frontend.scheduler = recorder
+    return recorder
+
+
+# -----------------------------
+# Reprodução
+# -----------------------------
+class Recording:
+    """Arquivo gravado, lido de uma vez: semente, frames e digest final."""
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            data = f.read()
+        if len(data) < HEADER.size:
+            raise ReplayError(f"{path}: arquivo curto demais")
+        magic, version, self.seed = HEADER.unpack_from(data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ReplayError(f"{path}: não é uma gravação (versão {VERSION})")
+        self.frames = []        # (t_ms, dt, [bytes do evento, ...])
+        self.digest = None
+        pos = HEADER.size
+        while pos + FRAME.size <= len(data):
+            t_ms, dt, n = FRAME.unpack_from(data, pos)
+            pos += FRAME.size
+            if n == END_MARK:
+                self.digest = data[pos:pos + DIGEST_SIZE]
+                break
+            end = pos + n * EVENT.size
+            if end > len(data):
+                break           # gravação cortada (jogo fechado à força)
+            self.frames.append((t_ms, dt, [data[i:i + EVENT.size] for i in range(pos, end, EVENT.size)]))
+            pos = end
+
+    def __len__(self):
+        return len(self.frames)
+
+    @property
+    def event_count(self):
+        return sum(len(events) for _, _, events in self.frames)
+
+
+class ReplayScheduler:
+    """Fornece os frames gravados no lugar do pygame, sem esperar nada."""
+
+    def __init__(self, recording):
+        self.recording = recording
+        self.index = 0
+
+    @property
+    def done(self):
+        return self.index >= len(self.recording.frames)
+
+    def next_events(self, active):
+        if self.done:
+            # acabou a gravação: o popup (se aberto) fecha, o jogo sai
+            return [pygame.event.Event(pygame.QUIT)], 0.0
+        _, dt, records = self.recording.frames[self.index]
+        self.index += 1
+        return [unpack_event(r) for r in records], dt
+
+
+def replay(path, draw=True, profile=None):
+    """
+    Reproduz a gravação sem janela e o mais rápido possível.
+    Devolve um dicionário com frames, eventos, tempo e se o estado final bate.
+    """
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    import backend
+    import frontend
+
+    recording = Recording(path)
+    backend.new_session(recording.seed)
+    player = ReplayScheduler(recording)
+    frontend.scheduler = player
+    if profile:
+        frontend.profiler.clear()
+        frontend.profiler.enabled = True
+    frontend.invalidate_screen()
+
+    t0 = time.perf_counter()
+    frontend.new_game()
+    frames = 0
+    while not player.done:
+        events, dt = player.next_events(True)
+        frames += 1
+        if draw:
+            running = frontend.run_frame(events, dt)
+        else:
+            t1 = time.perf_counter()
+            running = all([frontend.handle_event(e) for e in events])
+            t2 = time.perf_counter()
+            backend.update_animations(dt)
+            if profile:
+                frontend.profiler.record(t2 - t1, time.perf_counter() - t2, 0.0)
+        if not running:
+            break
+    elapsed = time.perf_counter() - t0
+
+    if profile:
+        frontend.profiler.dump_csv(profile)
+        frontend.profiler.enabled = False
+
+    digest = board_digest(backend.session)
+    return {
+        "frames": frames,
+        "events": recording.event_count,
+        "seconds": elapsed,
+        "recorded_ms": recording.frames[-1][0] if recording.frames else 0,
+        "equation": frontend.equation_text(),
+        "match": None if recording.digest is None else digest == recording.digest,
+    }
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Reproduz uma gravação do jogo sem janela.")
+    parser.add_argument("path")
+    parser.add_argument("--no-draw", action="store_true", help="só eventos e backend, sem desenhar")
+    parser.add_argument("--profile", help="grava o tempo de cada frame neste CSV")
+    args = parser.parse_args(argv)
+
+    result = replay(args.path, draw=not args.no_draw, profile=args.profile)
+    fps = result["frames"] / result["seconds"] if result["seconds"] > 0 else float("inf")
+    print(f"{result['frames']} frames, {result['events']} eventos em {result['seconds'] * 1000:.1f} ms "
+          f"({fps:.0f} frames/s; gravado em {result['recorded_ms'] / 1000:.1f} s)")
+    print(f"estado final: {result['equation']}")
+    if result["match"] is None:
+        print("gravação sem estado final para conferir")
+    elif not result["match"]:
+        print("ERRO: o estado final difere do gravado")
+        return 1
+    else:
+        print("estado final confere com o gravado")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
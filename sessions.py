@@ -0,0 +1,192 @@
+# sessions.py
+# Muitas partidas independentes (ex.: corrigir as entregas de uma turma).
+# As sessões ficam divididas em shards; cada shard é um processo com um
+# ProcessPoolExecutor de um worker só, então as sessões de um shard ficam
+# vivas na memória daquele processo entre um lote e outro.
+#
+#   with SessionEngine() as engine:
+#       engine.create(["ana", "bia"], seed=7)
+#       out = engine.step({"ana": [("add", "x", -1), ("divide", 2)],
+#                          "bia": [("move", 3, "right", 0)]})
+#       out["ana"]["solution"]
+#
+# As jogadas são as de engine.Session.apply. Sem pygame.
+
+import os
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+from engine import Session
+
+# -----------------------------
+# Lado do worker: as sessões do shard e as operações sobre elas
+# -----------------------------
+_local = {}   # sessões deste processo (cada worker tem o seu dicionário)
+
+
+def session_summary(session, results=None, error=None):
+    return {
+        "results": results if results is not None else [],
+        "equation": session.compute_equation_from_pieces(),
+        "solution": session.check_solved_and_return_solution(),
+        "divisoes": session.divisoes_visuais,
+        "message": session.message,
+        "error": error,
+    }
+
+
+def _op_create(store, specs):
+    for sid, seed, equation in specs:
+        session = Session(seed=seed, particles=0)   # sem tela: sem pool de bolhas
+        session.apply(("load",) + tuple(equation) if equation is not None else ("new",))
+        store[sid] = session
+    return len(specs)
+
+
+def _op_step(store, batch):
+    """Aplica as jogadas de cada sessão; um erro para só aquela sessão."""
+    out = {}
+    for sid, moves in batch:
+        session = store.get(sid)
+        if session is None:
+            out[sid] = {"error": f"sessão {sid!r} não existe"}
+            continue
+        results = []
+        error = None
+        for move in moves:
+            try:
+                results.append(session.apply(move))
+            except (ValueError, TypeError, IndexError, KeyError) as e:
+                error = f"{move!r}: {e}"
+                break
+        out[sid] = session_summary(session, results, error)
+    return out
+
+
+def _op_summary(store, sids):
+    return {sid: session_summary(store[sid]) for sid in sids if sid in store}
+
+
+def _op_pieces(store, sids):
+    return {sid: [(p.id, p.type, p.sign, p.side, p.sub, p.count) for p in store[sid].pieces]
+            for sid in sids if sid in store}
+
+
+def _op_remove(store, sids):
+    for sid in sids:
+        store.pop(sid, None)
+    return len(store)
+
+
+_OPS = {
+    "create": _op_create,
+    "step": _op_step,
+    "summary": _op_summary,
+    "pieces": _op_pieces,
+    "remove": _op_remove,
+}
+
+
+def _run(op, payload, store=None):
+    return _OPS[op](_local if store is None else store, payload)
+
+
+# -----------------------------
+# Lado do processo principal
+# -----------------------------
+class SessionEngine:
+    """
+    Hospeda sessões em `shards` shards. Com processes=False tudo roda no
+    próprio processo (mesma API; bom para testes e lotes pequenos).
+    """
+
+    def __init__(self, shards=None, processes=True):
+        self.shards = max(1, shards or os.cpu_count() or 1)
+        self.processes = processes
+        self._ids = set()
+        if processes:
+            self._executors = [ProcessPoolExecutor(max_workers=1) for _ in range(self.shards)]
+            self._stores = None
+        else:
+            self._executors = None
+            self._stores = [{} for _ in range(self.shards)]
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __contains__(self, sid):
+        return sid in self._ids
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def shard_of(self, sid):
+        # crc32 e não hash(): estável entre processos e execuções
+        return zlib.crc32(repr(sid).encode()) % self.shards
+
+    def _scatter(self, items, key=lambda item: item):
+        parts = [[] for _ in range(self.shards)]
+        for item in items:
+            parts[self.shard_of(key(item))].append(item)
+        return parts
+
+    def _dispatch(self, op, parts):
+        """Roda op em cada shard que tem trabalho (em paralelo) e retorna os resultados."""
+        if self._executors is None:
+            return [_run(op, part, self._stores[i]) for i, part in enumerate(parts) if part]
+        futures = [self._executors[i].submit(_run, op, part) for i, part in enumerate(parts) if part]
+        return [f.result() for f in futures]
+
+    def _gather(self, op, parts):
+        out = {}
+        for result in self._dispatch(op, parts):
+            out.update(result)
+        return out
+
+    def create(self, sids, seed=None, equations=None):
+        """
+        Cria sessões. Com seed, cada sessão sorteia de forma reprodutível
+        (semente derivada de seed e do id); equations (id -> (aL, bL, aR, bR))
+        fixa a equação de quem estiver nele.
+        """
+        equations = equations or {}
+        specs = []
+        for sid in sids:
+            if sid in self._ids:
+                raise ValueError(f"sessão {sid!r} já existe")
+            session_seed = None if seed is None else f"{seed}:{sid!r}"
+            specs.append((sid, session_seed, equations.get(sid)))
+        self._dispatch("create", self._scatter(specs, key=lambda spec: spec[0]))
+        self._ids.update(spec[0] for spec in specs)
+
+    def step(self, moves):
+        """
+        Lote de jogadas: {id: [jogada, ...]} (ou pares (id, jogadas)).
+        Retorna {id: resumo} com os resultados de cada jogada, a equação,
+        a solução (se resolvido) e o erro que interrompeu a sessão, se houve.
+        """
+        items = moves.items() if isinstance(moves, dict) else moves
+        return self._gather("step", self._scatter(items, key=lambda item: item[0]))
+
+    def summary(self, sids=None):
+        return self._gather("summary", self._scatter(self._ids if sids is None else sids))
+
+    def pieces(self, sids):
+        """{id: [(id da peça, tipo, sinal, lado, sub, contagem), ...]}"""
+        return self._gather("pieces", self._scatter(sids))
+
+    def remove(self, sids):
+        sids = [sid for sid in sids if sid in self._ids]
+        self._dispatch("remove", self._scatter(sids))
+        self._ids.difference_update(sids)
+
+    def close(self):
+        if self._executors is not None:
+            for ex in self._executors:
+                ex.shutdown()
+            self._executors = None
+            self._stores = [{} for _ in range(self.shards)]
+        self._ids.clear()
@@ -0,0 +1,164 @@
+# snapshot.py
+# Salva e restaura o tabuleiro de uma sessão num formato binário compacto.
+# Sem pygame. Usado para retomar a partida ao abrir o jogo e para guardar
+# muitos tabuleiros no servidor (dumps/loads trabalham só com bytes).
+#
+# Formato (little-endian):
+#   cabeçalho   MAGIC, versão, assinatura do layout, next_id, divisões,
+#               nº de peças, tamanho da mensagem, tem gauss
+#   mensagem    UTF-8
+#   RNG         versão do estado + 625 palavras u32 + gauss (f64)
+#   peças       registros de 21 bytes (id, tipo, sinal, lado, sub, contagem, x, y,
+#               posição no grupo), na ordem de desenho
+#
+# Se a assinatura do layout bate com a atual, as posições salvas são usadas
+# como estão (sem reempacotar); senão o tabuleiro é reempacotado uma vez.
+
+import mmap
+import os
+import random
+import struct
+import zlib
+from array import array
+
+from engine import (
+    WIDTH, HEIGHT, LEFT_X, RIGHT_X, AREA_Y, AREA_H, PIECE_SIZE,
+    LAYOUT_STEP, LAYOUT_COLS, TERMS, Rect, Piece,
+)
+
+MAGIC = b"JOGS"
+VERSION = 1
+HEADER = struct.Struct("<4sHIIHIHB")
+RECORD = struct.Struct("<IBbBHHiiH")
+RNG_WORDS = 625
+RNG_HEAD = struct.Struct("<Bd")
+
+SIDES = ("left", "right")
+_SIDE_CODE = {s: i for i, s in enumerate(SIDES)}
+
+# muda quando muda a geometria da grade: aí as posições salvas não valem
+LAYOUT_SIGNATURE = zlib.crc32(repr((WIDTH, HEIGHT, LEFT_X, RIGHT_X, AREA_Y, AREA_H,
+                                    PIECE_SIZE, LAYOUT_STEP, LAYOUT_COLS)).encode())
+
+
+class SnapshotError(ValueError):
+    pass
+
+
+def dumps(session):
+    """
+    Bytes com o estado completo da sessão (menos as animações).
+    SnapshotError se algum valor não cabe nos campos do formato.
+    """
+    try:
+        return _dumps(session)
+    except struct.error as e:
+        raise SnapshotError(f"tabuleiro não cabe no formato ({e})") from None
+
+
+def _dumps(session):
+    message = session.message.encode("utf-8")
+    rng_version, words, gauss = session.rng.getstate()
+    pieces = session.pieces
+
+    out = bytearray(HEADER.pack(MAGIC, VERSION, LAYOUT_SIGNATURE, session.next_id,
+                                session.divisoes_visuais, len(pieces), len(message),
+                                gauss is not None))
+    out += message
+    out += RNG_HEAD.pack(rng_version, gauss or 0.0)
+    out += array("I", words).tobytes()
+    pack = RECORD.pack
+    type_code = {t: i for i, t in enumerate(TERMS)}   # código = ordem de registro
+    out += b"".join([pack(p.id, type_code[p.type], p.sign, _SIDE_CODE[p.side], p.sub,
+                          p.count, p.rect.x, p.rect.y, p.gpos) for p in pieces])
+    return bytes(out)
+
+
+def loads(buf, session):
+    """
+    Restaura buf (bytes, memoryview ou mmap) dentro de session, sem copiar
+    o buffer. Retorna a sessão. Tudo é conferido antes de mexer na sessão:
+    arquivo cortado ou corrompido levanta SnapshotError e a deixa intacta.
+    """
+    mv = memoryview(buf)
+    error = None
+    try:
+        state = _parse(mv)
+    except SnapshotError as e:
+        error = str(e)
+    except (struct.error, ValueError, IndexError) as e:
+        error = f"snapshot corrompido ({e})"
+    if error is not None:
+        # levanta fora do except e sem views vivas: o mmap de load() pode fechar
+        mv.release()
+        raise SnapshotError(error)
+    divisoes, message, rng_state, pieces, next_id, valid = state
+
+    session.animations.clear()
+    session.clear_history()
+    session.divisoes_visuais = divisoes
+    session.message = message
+    session.rng.setstate(rng_state)
+    session.pieces.load(pieces)
+    session.next_id = next_id
+
+    # posições salvas ainda valem: nada a reempacotar
+    session._full_layout = not valid
+    if not valid:
+        session.pack_pieces()
+    if session.debug_checks:
+        session.pieces.check_totals()
+    return session
+
+
+def _parse(mv):
+    """Lê e confere o snapshot inteiro; não toca em nenhuma sessão."""
+    if len(mv) < HEADER.size:
+        raise SnapshotError("snapshot curto demais")
+    magic, version, signature, next_id, divisoes, n, msg_len, has_gauss = HEADER.unpack_from(mv, 0)
+    if magic != MAGIC or version != VERSION:
+        raise SnapshotError("não é um snapshot do jogo (ou versão diferente)")
+    pos = HEADER.size
+    end = pos + msg_len + RNG_HEAD.size + 4 * RNG_WORDS + n * RECORD.size
+    if end != len(mv):
+        raise SnapshotError("snapshot cortado" if end > len(mv) else "bytes sobrando no snapshot")
+    message = str(mv[pos:pos + msg_len], "utf-8")
+    pos += msg_len
+    rng_version, gauss = RNG_HEAD.unpack_from(mv, pos)
+    pos += RNG_HEAD.size
+    words = array("I")
+    words.frombytes(mv[pos:pos + 4 * RNG_WORDS])
+    pos += 4 * RNG_WORDS
+    rng_state = (rng_version, tuple(words), gauss if has_gauss else None)
+    random.Random().setstate(rng_state)     # estado inválido falha aqui
+
+    subs = max(1, divisoes)
+    types = tuple(TERMS)    # lido agora: vale para termos registrados depois do import
+    pieces = []
+    ids = set()
+    for pid, t, sign, side, sub, count, x, y, gpos in RECORD.iter_unpack(mv[pos:end]):
+        if (t >= len(types) or side >= len(SIDES) or sign not in (1, -1) or count < 1
+                or sub >= subs or pid in ids or pid >= next_id):
+            raise SnapshotError(f"peça {pid} inválida")
+        ids.add(pid)
+        piece = Piece(pid, types[t], sign, SIDES[side], sub, Rect(x, y, PIECE_SIZE, PIECE_SIZE), count)
+        piece.gpos = gpos
+        pieces.append(piece)
+    return divisoes, message, rng_state, pieces, next_id, signature == LAYOUT_SIGNATURE
+
+
+def save(session, path):
+    """Grava de forma atômica (arquivo temporário + rename)."""
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(dumps(session))
+    os.replace(tmp, path)
+
+
+def load(path, session):
+    """Restaura o arquivo em session via mmap. Retorna a sessão."""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            raise SnapshotError("snapshot vazio")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return loads(mm, session)
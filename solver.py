@@ -0,0 +1,200 @@
+# solver.py
+# Menor número de jogadas até "x = c" e a próxima jogada sugerida (dica).
+# Python puro, sem pygame. O cache é do módulo, então é compartilhado por
+# todas as sessões do processo.
+#
+# Estado canônico: (aL, bL, aR, bR) líquidos de cada lado, já normalizados
+# pela subdivisão em andamento (a anulação de pares é automática ao soltar
+# uma peça).
+# Jogadas:
+#   ("add", tipo, sinal)  — a mesma peça da paleta nos dois lados
+#   ("divide", k)         — dividir tudo em k grupos iguais (k >= 2)
+#   ("annihilate",)       — soltar uma peça para anular pares pendentes
+
+from collections import deque
+from functools import lru_cache
+from math import gcd
+
+from engine import solved_value
+
+SOLVER_CACHE_SIZE = 4096
+KNOWN_TABLE_SIZE = 65536   # estados com distância exata já conhecida
+
+ADD_MOVES = (("add", "x", 1), ("add", "x", -1), ("add", "n", 1), ("add", "n", -1))
+
+# tabela de transposição compartilhada: estado -> (distância, próxima jogada)
+_known = {}
+
+
+def is_goal(state):
+    # o mesmo critério de Session.check_solved_and_return_solution
+    return solved_value(*state) is not None
+
+
+def _swap(state):
+    aL, bL, aR, bR = state
+    return (aR, bR, aL, bL)
+
+
+def canonical_state(aL, bL, aR, bR, subdivision=1):
+    """
+    Normaliza o estado: uma divisão em andamento que fecha (todos os valores
+    divisíveis) já conta como feita; uma que não fecha é ignorada, porque a
+    próxima divisão a substitui. Trocar os lados não muda a distância.
+    """
+    sub = max(1, subdivision)
+    if sub > 1 and aL % sub == 0 and bL % sub == 0 and aR % sub == 0 and bR % sub == 0:
+        aL, bL, aR, bR = aL // sub, bL // sub, aR // sub, bR // sub
+    state = (aL, bL, aR, bR)
+    return min(state, _swap(state))
+
+
+def _moves(state):
+    aL, bL, aR, bR = state
+    for move in ADD_MOVES:
+        _, ptype, sign = move
+        if ptype == "x":
+            yield move, (aL + sign, bL, aR + sign, bR)
+        else:
+            yield move, (aL, bL + sign, aR, bR + sign)
+    g = gcd(gcd(aL, bL), gcd(aR, bR))
+    for k in range(2, g + 1):
+        if g % k == 0:
+            yield ("divide", k), (aL // k, bL // k, aR // k, bR // k)
+
+
+def _remember(state, dist, move):
+    if len(_known) >= KNOWN_TABLE_SIZE:
+        _known.clear()
+    key = min(state, _swap(state))
+    _known[key] = (dist, move)
+
+
+def _lookup(state):
+    return _known.get(min(state, _swap(state)))
+
+
+def _bfs(start):
+    """
+    Busca em largura com tabela de transposição. Estados com distância já
+    conhecida (de buscas anteriores) encurtam a busca.
+    """
+    if is_goal(start):
+        return 0, None
+
+    aL, bL, aR, bR = start
+    A = aL - aR
+    if A == 0:
+        return None     # x some dos dois lados: não há solução
+    # somar dos dois lados mantém aL - aR e bL - bR; fora desta janela não
+    # há caminho mais curto
+    bound = 2 * (max(abs(aL), abs(bL), abs(aR), abs(bR)) + abs(A) + abs(bL - bR)) + 2
+
+    parent = {start: None}
+    frontier = deque([start])
+    depth = {start: 0}
+    best = None          # (total, estado, distância restante, jogada)
+
+    while frontier:
+        state = frontier.popleft()
+        d = depth[state]
+        if best is not None and d + 1 >= best[0]:
+            break
+        for move, nxt in _moves(state):
+            if nxt in parent:
+                continue
+            if max(abs(v) for v in nxt) > bound:
+                continue
+            parent[nxt] = (state, move)
+            depth[nxt] = d + 1
+            if is_goal(nxt):
+                best = (d + 1, nxt, 0, None)
+                break
+            known = _lookup(nxt)
+            if known is not None and (best is None or d + 1 + known[0] < best[0]):
+                best = (d + 1 + known[0], nxt, known[0], known[1])
+            frontier.append(nxt)
+        if best is not None and best[2] == 0:
+            break
+
+    if best is None:
+        return None
+
+    # reconstrói o caminho até a raiz e registra as distâncias exatas
+    total, state, _, move = best
+    path = []
+    while parent[state] is not None:
+        prev, m = parent[state]
+        path.append((prev, m))
+        state = prev
+    path.reverse()
+    for i, (s, m) in enumerate(path):
+        _remember(s, total - i, m)
+    first = path[0][1] if path else move
+    return total, first
+
+
+@lru_cache(maxsize=SOLVER_CACHE_SIZE)
+def _solve(state):
+    return _bfs(state)
+
+
+def solve(aL, bL, aR, bR, subdivision=1):
+    """
+    (número mínimo de jogadas, próxima jogada) para chegar a "x = c",
+    ou None se a equação não tem solução inteira alcançável.
+    A próxima jogada é None quando já está resolvido.
+    """
+    return _solve(canonical_state(aL, bL, aR, bR, subdivision))
+
+
+def cache_info():
+    return _solve.cache_info(), len(_known)
+
+
+def clear_cache():
+    _solve.cache_clear()
+    _known.clear()
+
+
+# -----------------------------
+# Integração com uma Session
+# -----------------------------
+def hint_for_session(session):
+    """
+    (jogadas mínimas, próxima jogada) a partir do tabuleiro da sessão.
+    Pares opostos ainda não anulados custam uma jogada a mais.
+    """
+    aL, bL, aR, bR = session.compute_equation_from_pieces()
+    if session.debug_checks and session.divisoes_visuais <= 1 and not session.has_pending_pairs():
+        # sem divisão nem pares pendentes, o solver e o jogo veem o mesmo estado
+        if is_goal((aL, bL, aR, bR)) != (session.check_solved_and_return_solution() is not None):
+            raise AssertionError(f"solver e jogo discordam sobre {(aL, bL, aR, bR)} estar resolvido")
+    result = solve(aL, bL, aR, bR, session.divisoes_visuais)
+    if result is None:
+        return None
+    if session.has_pending_pairs():
+        return result[0] + 1, ("annihilate",)
+    return result
+
+
+def describe_move(move):
+    if move is None:
+        return "Resolvido!"
+    kind = move[0]
+    if kind == "add":
+        _, ptype, sign = move
+        label = ("+" if sign > 0 else "-") + ("x" if ptype == "x" else "1")
+        return f"Adicione {label} dos dois lados."
+    if kind == "divide":
+        return f"Divida os dois lados em {move[1]} grupos iguais."
+    if kind == "annihilate":
+        return "Arraste uma peça para anular os pares opostos."
+    return str(move)
+
+
+def score(optimal_moves, used_moves):
+    """Nota entre 0 e 1: jogadas ótimas / jogadas usadas."""
+    if used_moves <= 0:
+        return 1.0 if optimal_moves == 0 else 0.0
+    return min(1.0, optimal_moves / used_moves)
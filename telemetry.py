@@ -0,0 +1,143 @@
+# telemetry.py
+# Registro das ações do aluno (telemetria) sem travar o mainloop.
+#
+# O loop só faz sink.emit(tipo, campos): um append numa deque (atômico no
+# CPython, sem lock). Uma thread de fundo junta os eventos em lotes e grava
+# num arquivo só de acréscimo — JSONL ou SQLite, pela extensão do caminho.
+# A fila tem limite: sob pressão os eventos novos são descartados e contados.
+#
+#   sink = TelemetrySink("alunos.jsonl")
+#   sink.emit("add", {"type": "x", "sign": 1})
+#   sink.close()
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import deque
+
+FLUSH_INTERVAL = 1.0      # segundos entre gravações
+BATCH_SIZE = 256          # eventos por lote (um lote cheio acorda a thread)
+QUEUE_CAPACITY = 10000    # acima disso, eventos novos são descartados
+
+SQLITE_SUFFIXES = (".sqlite", ".sqlite3", ".db")
+
+
+class TelemetrySink:
+    """
+    Fila limitada + thread gravadora. emit() nunca bloqueia nem faz E/S.
+    dropped conta os eventos descartados; written, os gravados.
+    """
+
+    def __init__(self, path, flush_interval=FLUSH_INTERVAL, batch_size=BATCH_SIZE,
+                 capacity=QUEUE_CAPACITY, session_id=None):
+        self.path = path
+        self.format = "sqlite" if path.lower().endswith(SQLITE_SUFFIXES) else "jsonl"
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.capacity = capacity
+        self.session_id = session_id or uuid.uuid4().hex
+        self.dropped = 0
+        self.written = 0
+        self._queue = deque()
+        self._wake = threading.Event()
+        self._stop = False
+        self._thread = threading.Thread(target=self._run, name="telemetry", daemon=True)
+        self._thread.start()
+
+    def emit(self, kind, fields=None):
+        """Enfileira um evento. Descarta (e conta) se a fila está cheia."""
+        queue = self._queue
+        if len(queue) >= self.capacity:
+            self.dropped += 1
+            return
+        queue.append((time.time(), kind, fields))
+        if len(queue) == self.batch_size:
+            self._wake.set()
+
+    def close(self, timeout=5.0):
+        """Grava o que falta (e quantos foram descartados) e encerra a thread."""
+        if self._stop:
+            return
+        self._stop = True
+        self._wake.set()
+        self._thread.join(timeout)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # -----------------------------
+    # Thread gravadora
+    # -----------------------------
+    def _take(self):
+        queue = self._queue
+        n = min(len(queue), self.batch_size)
+        return [queue.popleft() for _ in range(n)]
+
+    def _run(self):
+        writer = _SqliteWriter(self.path) if self.format == "sqlite" else _JsonlWriter(self.path)
+        try:
+            while True:
+                self._wake.wait(self.flush_interval)
+                self._wake.clear()
+                stopping = self._stop
+                batch = self._take()
+                while batch:
+                    writer.write(self.session_id, batch)
+                    self.written += len(batch)
+                    batch = self._take()
+                if stopping:
+                    if self.dropped:
+                        writer.write(self.session_id, [(time.time(), "telemetry_dropped",
+                                                        {"count": self.dropped})])
+                    break
+        finally:
+            writer.close()
+
+
+class _JsonlWriter:
+    def __init__(self, path):
+        self.file = open(path, "a", encoding="utf-8")
+
+    def write(self, session_id, batch):
+        dumps = json.dumps
+        self.file.write("".join(
+            dumps({"t": round(t, 3), "session": session_id, "event": kind, **(fields or {})},
+                  ensure_ascii=False) + "\n"
+            for t, kind, fields in batch))
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class _SqliteWriter:
+    def __init__(self, path):
+        # a conexão é criada e usada só na thread gravadora
+        self.db = sqlite3.connect(path)
+        self.db.execute("CREATE TABLE IF NOT EXISTS events ("
+                        "t REAL, session TEXT, event TEXT, data TEXT)")
+        self.db.commit()
+
+    def write(self, session_id, batch):
+        self.db.executemany(
+            "INSERT INTO events (t, session, event, data) VALUES (?, ?, ?, ?)",
+            [(t, session_id, kind, json.dumps(fields, ensure_ascii=False) if fields else None)
+             for t, kind, fields in batch])
+        self.db.commit()
+
+    def close(self):
+        self.db.close()
+
+
+def open_sink(path, **kwargs):
+    """Cria o sink, com o diretório do arquivo se ainda não existir."""
+    folder = os.path.dirname(path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    return TelemetrySink(path, **kwargs)
@@ -0,0 +1,122 @@
+# worksheet.py
+# Importação de listas de exercícios (bancos de questões) em fluxo.
+#
+# Lê o arquivo linha a linha e passa por uma cadeia de geradores:
+#   linhas -> registros (id, texto) -> equações -> layouts de peças
+# Nada é acumulado: a memória fica constante mesmo com 50.000 equações.
+# O parsing usa o tokenizador do engine, com memo pela forma normalizada,
+# e os layouts vêm de engine.equation_layout (também memoizado).
+#
+# Formatos:
+#   texto  uma equação por linha; linhas vazias e comentários (#) são ignorados
+#   JSONL  um objeto por linha: {"equation": "2x + 1 = 7", "id": "q1", ...}
+#
+#   python worksheet.py banco.jsonl
+
+import json
+import sys
+import time
+
+from engine import parse_equation, equation_layout
+
+JSON_KEYS = ("equation", "eq", "equacao")
+
+
+class WorksheetError(ValueError):
+    """Linha inválida: guarda o número da linha."""
+
+    def __init__(self, line_no, message):
+        super().__init__(f"linha {line_no}: {message}")
+        self.line_no = line_no
+
+
+def read_lines(path):
+    """(número da linha, texto) de cada linha não vazia e não comentário."""
+    with open(path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            text = line.strip()
+            if text and not text.startswith("#"):
+                yield line_no, text
+
+
+def records(lines, errors=None):
+    """
+    (linha, id, texto da equação). JSONL é detectado linha a linha pelo '{'.
+    Com errors (uma lista), linhas inválidas são anotadas nela e puladas.
+    """
+    for line_no, text in lines:
+        if not text.startswith("{"):
+            yield line_no, None, text
+            continue
+        try:
+            obj = json.loads(text)
+        except json.JSONDecodeError as e:
+            err = WorksheetError(line_no, f"JSON inválido ({e.msg})")
+        else:
+            eq = None
+            if isinstance(obj, dict):
+                eq = next((obj[k] for k in JSON_KEYS if isinstance(obj.get(k), str)), None)
+            if eq is not None:
+                yield line_no, obj.get("id"), eq
+                continue
+            err = WorksheetError(line_no, "objeto sem campo 'equation'")
+        if errors is None:
+            raise err
+        errors.append(err)
+
+
+def equations(recs, errors=None):
+    """
+    (linha, id, (aL, bL, aR, bR)). Com errors (uma lista), linhas inválidas
+    são anotadas nela e puladas; sem ela, o primeiro erro interrompe.
+    """
+    for line_no, item_id, text in recs:
+        try:
+            yield line_no, item_id, parse_equation(text)
+        except ValueError as e:
+            err = WorksheetError(line_no, f"{e} em {text!r}")
+            if errors is None:
+                raise err from None
+            errors.append(err)
+
+
+def layouts(eqs):
+    """(linha, id, equação, layout) — layout pronto para Session.load_layout."""
+    for line_no, item_id, eq in eqs:
+        yield line_no, item_id, eq, equation_layout(*eq)
+
+
+def import_worksheet(path, errors=None):
+    """Cadeia completa, preguiçosa: um item por equação válida do arquivo."""
+    return layouts(equations(records(read_lines(path), errors), errors))
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Importa e confere uma lista de equações.")
+    parser.add_argument("path")
+    parser.add_argument("--strict", action="store_true", help="para na primeira linha inválida")
+    args = parser.parse_args(argv)
+
+    errors = None if args.strict else []
+    t0 = time.perf_counter()
+    count = pieces = 0
+    try:
+        for _, _, _, layout in import_worksheet(args.path, errors):
+            count += 1
+            pieces += len(layout)
+    except WorksheetError as e:
+        print(e)
+        return 1
+    elapsed = time.perf_counter() - t0
+
+    print(f"{count} equações ({pieces} peças) em {elapsed:.2f} s")
+    for e in (errors or [])[:20]:
+        print(f"  {e}")
+    if errors and len(errors) > 20:
+        print(f"  ... e mais {len(errors) - 20} linhas inválidas")
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())